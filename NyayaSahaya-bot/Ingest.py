@@ -1,61 +1,831 @@
-import ray
+"""Build or update the ipc_embed_db FAISS index from the text files in data/.
+
+Chunks are embedded INGEST_BATCH_SIZE at a time with ``embed_documents`` and
+every batch is added to the index in a single call. With Ray installed the
+batches are sharded across INGEST_ACTORS actors that each hold one copy of the
+model; without it the model is loaded once in this process. The FAISS index
+type comes from VECTOR_INDEX_TYPE (see vector_index.py); trained types are
+trained on the first VECTOR_INDEX_TRAIN_SAMPLE embedded chunks; quantized
+types also get a float32 ``vectors.npy`` for exact re-ranking. A BM25 index
+over the same chunks is saved alongside for hybrid retrieval (see bm25.py).
+
+Before embedding, chunks that are near-duplicates of one already indexed
+(estimated Jaccard similarity of word shingles >= INGEST_DEDUP_THRESHOLD,
+see dedup.py) are dropped and listed under ``duplicates`` in the manifest.
+
+Files are streamed through split, dedup, embed and add one batch at a time, so
+memory is bounded by the batch size plus what the store itself keeps (the
+index and LangChain's docstore, which index.pkl needs), not by the corpus.
+Until a trained index type has its sample, embedded batches are spilled to
+disk rather than held, and only the sample vectors are loaded to train it.
+
+A manifest of file and chunk hashes is saved next to the index, so a re-run
+only embeds chunks that are new, drops vectors for chunks that are gone and
+leaves everything else alone. Every INGEST_CHECKPOINT_CHUNKS chunks the store
+and that manifest are checkpointed, so a run that crashes resumes where it
+stopped. Run with ``python Ingest.py`` from this directory; set
+INGEST_REBUILD=1 to start from scratch.
+
+The same script builds the precedent index that /api/find-precedents searches:
+
+    INGEST_DATA_DIR=data/precedents INGEST_OUTPUT_DIR=precedent_db INGEST_NORMALIZE=1 python Ingest.py
+
+A file may start with ``Field: value`` lines (Title, Citation, Court, ...,
+see HEADER_FIELDS) followed by a blank line; they are kept as metadata on
+every chunk of that file rather than embedded.
+"""
+import collections
+import glob
+import hashlib
+import itertools
+import json
 import logging
-from langchain_community.document_loaders import DirectoryLoader
+import os
+import re
+import shutil
+import time
+
+import numpy as np
+from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.document_loaders import TextLoader
 from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
-from faiss import IndexFlatL2  # Assuming using L2 distance for simplicity
 
-# Initialize Ray
-ray.init()
+import vector_index
+from bm25 import BM25_FILE, BM25Index
+from dedup import NearDuplicateIndex
+
+try:
+    import ray
+    from ray.util import ActorPool
+except ImportError:
+    ray = None
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "law-ai/InLegalBERT")
+INGEST_DATA_DIR = os.getenv("INGEST_DATA_DIR", "data")
+INGEST_OUTPUT_DIR = os.getenv("INGEST_OUTPUT_DIR", "ipc_embed_db")
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "1024"))
+INGEST_CHUNK_OVERLAP = int(os.getenv("INGEST_CHUNK_OVERLAP", "200"))
+# Each actor holds a full model; 0 embeds in this process even if Ray is installed
+INGEST_ACTORS = int(os.getenv("INGEST_ACTORS", str(max(1, (os.cpu_count() or 1) // 4))))
+INGEST_REBUILD = os.getenv("INGEST_REBUILD", "0") == "1"
+INGEST_CHECKPOINT_CHUNKS = int(os.getenv("INGEST_CHECKPOINT_CHUNKS", "5000"))
+# 0 discards an interrupted run's checkpoint instead of resuming from it
+INGEST_RESUME = os.getenv("INGEST_RESUME", "1") == "1"
+# Chunks at least this similar to an indexed chunk are not embedded; 0 keeps everything
+INGEST_DEDUP_THRESHOLD = float(os.getenv("INGEST_DEDUP_THRESHOLD", "0.8"))
+# Unit-length vectors, so L2 distance maps straight to cosine similarity
+INGEST_NORMALIZE = os.getenv("INGEST_NORMALIZE", "0") == "1"
+
+MANIFEST_NAME = "manifest.json"
+CHECKPOINT_DIR = "checkpoint"
+TRAINING_VECTORS = "training.f32"
+TRAINING_CHUNKS = "training.jsonl"
+HEADER_FIELDS = ("title", "citation", "court", "date", "case_type", "verdict", "reasoning", "key_takeaway")
+HEADER_LINE = re.compile(r"^([A-Za-z][A-Za-z ]{1,20}):\s*(.+)$")
 
 # Set up basic configuration for logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Load documents with logging
-logging.info("Loading documents...")
-loader = DirectoryLoader('data', glob="./*.txt")
-documents = loader.load()
-
-# Extract text from documents and split into manageable texts with logging
-logging.info("Extracting and splitting texts from documents...")
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=1024, chunk_overlap=200)
-texts = []
-for document in documents:
-    if hasattr(document, 'get_text'):
-        text_content = document.get_text()  # Adjust according to actual method
+
+def ingest_settings():
+    """Settings that change chunk boundaries or vectors; any change forces a rebuild"""
+    return {
+        "model": EMBEDDING_MODEL,
+        "chunk_size": INGEST_CHUNK_SIZE,
+        "chunk_overlap": INGEST_CHUNK_OVERLAP,
+        "normalize": INGEST_NORMALIZE,
+        "dedup_threshold": INGEST_DEDUP_THRESHOLD,
+        "index": vector_index.index_settings(),
+    }
+
+
+def list_sources(data_dir=INGEST_DATA_DIR):
+    return sorted(glob.glob(os.path.join(data_dir, "*.txt")))
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(1024 * 1024):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(name, text):
+    """Stable docstore id for a chunk of one source file"""
+    return hashlib.sha256(f"{name}\0{text}".encode("utf-8")).hexdigest()
+
+
+def split_header(text):
+    """Split leading ``Field: value`` lines off ``text``: ``(fields, body)``.
+
+    Only names in HEADER_FIELDS count, so ordinary text that happens to start
+    with a colon line is left alone.
+    """
+    fields = {}
+    lines = text.lstrip("\ufeff").split("\n")
+    for position, line in enumerate(lines):
+        match = HEADER_LINE.match(line.strip())
+        key = match.group(1).strip().lower().replace(" ", "_") if match else None
+        if key not in HEADER_FIELDS:
+            if not fields:
+                return {}, text
+            # The blank line closing the header is not part of the body
+            return fields, "\n".join(lines[position + (not line.strip()):])
+        fields[key] = match.group(2).strip()
+    return fields, ""
+
+
+def load_file_chunks(path):
+    """Load one text file and split it into overlapping chunks.
+
+    Chunks are LangChain ``Document`` objects, so each keeps the ``source``
+    file it came from, and any header fields, in its metadata.
+    """
+    documents = TextLoader(path, encoding="utf-8").load()
+    for document in documents:
+        fields, document.page_content = split_header(document.page_content)
+        document.metadata.update(fields)
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=INGEST_CHUNK_SIZE, chunk_overlap=INGEST_CHUNK_OVERLAP
+    )
+    return text_splitter.split_documents(documents)
+
+
+def load_manifest(output_dir=INGEST_OUTPUT_DIR):
+    """Return the saved manifest, or None when the index has to be rebuilt"""
+    if not os.path.exists(os.path.join(output_dir, "index.faiss")):
+        return None
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("settings") != ingest_settings():
+        logging.info("Ingest settings changed since the last run, rebuilding.")
+        return None
+    return manifest
+
+
+def save_manifest(files, output_dir=INGEST_OUTPUT_DIR):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"settings": ingest_settings(), "files": files}, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def plan_changes(sources, manifest):
+    """Compare ``sources`` with the manifest, keeping only chunk ids in memory.
+
+    Unchanged files are not even read past their hash; changed files are
+    split once here to find their chunk ids and again, one at a time, when
+    their new chunks are embedded. Chunks dropped as near-duplicates by an
+    earlier run are not checked again. Returns the new manifest ``files``
+    entry, ``{name: (path, handled_ids, new_count)}`` for every changed file,
+    and the ids of indexed chunks that no longer exist.
+    """
+    old_files = manifest["files"] if manifest else {}
+    files = {}
+    changed = {}
+    stale_ids = set()
+
+    for path in sources:
+        name = os.path.basename(path)
+        digest = file_hash(path)
+        previous = old_files.get(name)
+        if previous and previous["sha256"] == digest:
+            files[name] = previous
+            continue
+
+        ids = list(dict.fromkeys(chunk_id(name, chunk.page_content) for chunk in load_file_chunks(path)))
+        old_ids = set(previous["chunks"]) if previous else set()
+        duplicates = set(previous.get("duplicates", ())) if previous else set()
+        stale_ids |= old_ids.difference(ids)
+        handled = old_ids | duplicates
+        changed[name] = (path, handled, sum(doc_id not in handled for doc_id in ids))
+        # New chunks are listed as indexed until the dedup stage says otherwise
+        files[name] = {
+            "sha256": digest,
+            "chunks": [doc_id for doc_id in ids if doc_id not in duplicates],
+            "duplicates": [doc_id for doc_id in ids if doc_id in duplicates],
+        }
+
+    for name in old_files.keys() - files.keys():
+        stale_ids |= set(old_files[name]["chunks"])
+
+    if stale_ids:
+        # The chunk a duplicate was dropped for may be going away, so check them all again
+        for path in sources:
+            name = os.path.basename(path)
+            duplicates = files[name].get("duplicates")
+            if not duplicates:
+                continue
+            if name in changed:
+                _, handled, new_count = changed[name]
+                changed[name] = (path, handled.difference(duplicates), new_count + len(duplicates))
+            else:
+                changed[name] = (path, set(files[name]["chunks"]), len(duplicates))
+            files[name] = {**files[name], "chunks": files[name]["chunks"] + duplicates, "duplicates": []}
+    return files, changed, stale_ids
+
+
+def needs_rebuild(manifest, stale_ids, untrained=False, kind=vector_index.VECTOR_INDEX_TYPE):
+    """Whether removing ``stale_ids`` from the existing store means starting over.
+
+    Index types that cannot delete in place are rebuilt, and so is a resumed
+    run whose chunks were embedded before the index was trained.
+    """
+    return bool(manifest and stale_ids and (untrained or not vector_index.supports_remove(kind)))
+
+
+def iter_new_chunks(changed):
+    """Yield ``(name, chunk, doc_id)`` for every chunk of ``changed`` files not yet handled"""
+    for name, (path, handled, _) in changed.items():
+        seen = set(handled)
+        for chunk in load_file_chunks(path):
+            doc_id = chunk_id(name, chunk.page_content)
+            if doc_id not in seen:
+                seen.add(doc_id)
+                yield name, chunk, doc_id
+
+
+def drop_near_duplicates(items, near_duplicates, on_drop):
+    """Pass on the ``(name, chunk, doc_id)`` items that are not near-duplicates.
+
+    ``near_duplicates`` should already hold the chunks in the index; each
+    dropped item is reported to ``on_drop`` instead of being yielded.
+    """
+    for item in items:
+        if near_duplicates.add(item[1].page_content):
+            yield item
+        else:
+            on_drop(item)
+
+
+def seed_near_duplicates(store, spill=None, threshold=INGEST_DEDUP_THRESHOLD):
+    """A NearDuplicateIndex over the chunks already in ``store`` and ``spill`` (either may be None)"""
+    near_duplicates = NearDuplicateIndex(threshold)
+    if store is not None:
+        for doc_id in store.index_to_docstore_id.values():
+            near_duplicates.insert(store.docstore.search(doc_id).page_content)
+    if spill is not None:
+        for _, chunk, _ in spill.items():
+            near_duplicates.insert(chunk.page_content)
+    return near_duplicates
+
+
+def load_embeddings(model_name=EMBEDDING_MODEL, batch_size=INGEST_BATCH_SIZE):
+    """Load the embedding model once for the whole run"""
+    return HuggingFaceEmbeddings(model_name=model_name, encode_kwargs={"batch_size": batch_size})
+
+
+def embed_texts(embeddings, texts, normalize=INGEST_NORMALIZE):
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype="float32")
+    if normalize:
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    return vectors
+
+
+class EmbeddingWorker:
+    """One embedding model, run as a Ray actor"""
+
+    def __init__(self, model_name=EMBEDDING_MODEL, batch_size=INGEST_BATCH_SIZE):
+        self.embeddings = load_embeddings(model_name, batch_size)
+
+    def embed(self, texts):
+        return embed_texts(self.embeddings, texts)
+
+
+def start_actor_pool(actors=INGEST_ACTORS):
+    """Start ``actors`` embedding actors, or return None to embed locally"""
+    if actors < 1:
+        return None
+    if ray is None:
+        logging.warning("Ray is not installed, embedding in this process.")
+        return None
+
+    ray.init(ignore_reinit_error=True)
+    # Ray sets OMP_NUM_THREADS from num_cpus, so torch in each actor uses its share of cores
+    cpus_per_actor = max(1, int(ray.cluster_resources().get("CPU", 1)) // actors)
+    worker = ray.remote(num_cpus=cpus_per_actor)(EmbeddingWorker)
+    logging.info("Starting %d embedding actors with %d CPUs each...", actors, cpus_per_actor)
+    return ActorPool([worker.remote() for _ in range(actors)])
+
+
+def batched(items, size):
+    """Lists of up to ``size`` items from any iterable, without reading ahead"""
+    items = iter(items)
+    while batch := list(itertools.islice(items, size)):
+        yield batch
+
+
+def embed_batches(batches, embeddings=None, pool=None):
+    """Yield ``(batch, vectors)`` in input order, vectors as a float32 matrix.
+
+    ``batches`` holds ``(name, chunk, doc_id)`` lists and is consumed lazily.
+    Batches go to ``pool`` when given, otherwise to the local ``embeddings``.
+    """
+    if pool is None:
+        for batch in batches:
+            yield batch, embed_texts(embeddings, [chunk.page_content for _, chunk, _ in batch])
+        return
+
+    # At most one batch in flight per actor, so the source is never read far ahead;
+    # ActorPool.get_next returns results in submission order
+    in_flight = collections.deque()
+    for batch in batches:
+        if not pool.has_free():
+            yield in_flight.popleft(), pool.get_next()
+        pool.submit(lambda actor, texts: actor.embed.remote(texts), [chunk.page_content for _, chunk, _ in batch])
+        in_flight.append(batch)
+    while in_flight:
+        yield in_flight.popleft(), pool.get_next()
+
+
+def new_store(embeddings, sample):
+    """Empty store whose index is built (and trained) from ``sample`` vectors"""
+    return FAISS(embeddings, vector_index.build_index(sample), InMemoryDocstore(), {})
+
+
+def add_batch(store, batch, vectors):
+    store.add_embeddings(
+        zip([chunk.page_content for _, chunk, _ in batch], vectors),
+        metadatas=[chunk.metadata for _, chunk, _ in batch],
+        ids=[doc_id for _, _, doc_id in batch],
+    )
+
+
+def other_part_path(part_path):
+    """The alternate name for a vector copy's part file: ``x.part`` <-> ``x.alt.part``"""
+    if part_path.endswith(".alt.part"):
+        return part_path[:-len(".alt.part")] + ".part"
+    return part_path[:-len(".part")] + ".alt.part"
+
+
+class VectorCopy:
+    """Float32 copy of every vector in FAISS position order, for re-ranking quantized indexes.
+
+    Rows are appended to a raw ``.part`` file as batches arrive, so the copy
+    never has to fit in memory, and written out as VECTORS_FILE at the end.
+    """
+
+    BLOCK_ROWS = 65536
+
+    def __init__(self, part_path, rows=0, dim=None):
+        self.part_path = part_path
+        self.rows = rows
+        self.dim = dim
+        # Drop anything written after the checkpoint that recorded ``rows``
+        with open(part_path, "ab") as f:
+            f.truncate(rows * (dim or 0) * 4)
+        self.file = open(part_path, "ab")
+
+    @classmethod
+    def from_previous(cls, part_path, store, stale_ids, output_dir=INGEST_OUTPUT_DIR):
+        """Start from the saved copy of ``store``, minus the rows of ``stale_ids``.
+
+        Call before ``store.delete(stale_ids)``: deleting shifts the remaining
+        vectors down exactly like dropping these rows. Returns None when there
+        is no usable copy.
+        """
+        path = os.path.join(output_dir, vector_index.VECTORS_FILE)
+        if not os.path.exists(path):
+            logging.warning("No %s for this index; set INGEST_REBUILD=1 to enable exact re-ranking.", path)
+            return None
+        previous = np.load(path, mmap_mode="r")
+        if len(previous) != store.index.ntotal:
+            logging.warning("%s does not match the index; set INGEST_REBUILD=1 to enable exact re-ranking.", path)
+            return None
+        return cls.without_stale(previous, part_path, store, stale_ids)
+
+    @classmethod
+    def resume(cls, part_path, rows, store, stale_ids):
+        """Reopen the checkpointed copy of ``rows`` rows, minus the rows of ``stale_ids``.
+
+        Call before ``store.delete(stale_ids)``, as with :meth:`from_previous`.
+        The remaining rows go to the other part file, so the checkpointed one
+        stays intact until a checkpoint names its replacement.
+        """
+        copy = cls(part_path, rows, store.index.d)
+        if not stale_ids:
+            return copy
+        copy.file.close()
+        previous = np.memmap(part_path, dtype="float32", mode="r", shape=(rows, store.index.d))
+        fresh = cls.without_stale(previous, other_part_path(part_path), store, stale_ids)
+        del previous
+        return fresh
+
+    @classmethod
+    def without_stale(cls, previous, part_path, store, stale_ids):
+        """New copy at ``part_path`` holding the rows of ``previous`` not belonging to ``stale_ids``"""
+        keep = np.ones(len(previous), dtype=bool)
+        positions = {doc_id: position for position, doc_id in store.index_to_docstore_id.items()}
+        keep[[positions[doc_id] for doc_id in stale_ids]] = False
+        copy = cls(part_path, dim=previous.shape[1])
+        for start in range(0, len(previous), cls.BLOCK_ROWS):
+            block = previous[start:start + cls.BLOCK_ROWS]
+            copy.append(block[keep[start:start + cls.BLOCK_ROWS]])
+        return copy
+
+    def append(self, vectors):
+        self.dim = vectors.shape[1]
+        self.file.write(np.ascontiguousarray(vectors, dtype="float32").tobytes())
+        self.rows += len(vectors)
+
+    def flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def save(self, path, dim):
+        """Write the rows as an .npy file at ``path``, a block at a time"""
+        self.file.close()
+        dim = self.dim or dim
+        part = np.memmap(self.part_path, dtype="float32", mode="r", shape=(self.rows, dim)) if self.rows else None
+        tmp_path = f"{path}.tmp.npy"
+        out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype="float32", shape=(self.rows, dim))
+        for start in range(0, self.rows, self.BLOCK_ROWS):
+            out[start:start + self.BLOCK_ROWS] = part[start:start + self.BLOCK_ROWS]
+        out.flush()
+        del out, part
+        os.replace(tmp_path, path)
+        os.remove(self.part_path)
+
+
+class TrainingSpill:
+    """Batches embedded before the index is trained, kept on disk instead of in memory.
+
+    Vectors go to a raw float32 file and chunks to a JSON-lines file in the
+    checkpoint directory. Both are cut back to ``rows`` on open, which drops
+    anything written after the checkpoint that recorded them.
+    """
+
+    def __init__(self, directory, rows=0, dim=None):
+        self.vectors_path = os.path.join(directory, TRAINING_VECTORS)
+        self.chunks_path = os.path.join(directory, TRAINING_CHUNKS)
+        self.rows = rows
+        self.dim = dim
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(rows * (dim or 0) * 4)
+        size = 0
+        if rows:
+            with open(self.chunks_path, "rb") as f:
+                size = sum(len(line) for line in itertools.islice(f, rows))
+        with open(self.chunks_path, "ab") as f:
+            f.truncate(size)
+        self.vector_file = open(self.vectors_path, "ab")
+        self.chunk_file = open(self.chunks_path, "a", encoding="utf-8")
+
+    def append(self, batch, vectors):
+        self.dim = vectors.shape[1]
+        self.vector_file.write(np.ascontiguousarray(vectors, dtype="float32").tobytes())
+        for name, chunk, doc_id in batch:
+            record = {"name": name, "text": chunk.page_content, "metadata": chunk.metadata, "id": doc_id}
+            self.chunk_file.write(json.dumps(record) + "\n")
+        self.rows += len(batch)
+
+    def flush(self):
+        for f in (self.vector_file, self.chunk_file):
+            f.flush()
+            os.fsync(f.fileno())
+
+    def vectors(self):
+        self.vector_file.flush()
+        return np.memmap(self.vectors_path, dtype="float32", mode="r", shape=(self.rows, self.dim))
+
+    def items(self):
+        """Yield the spilled ``(name, chunk, doc_id)`` items in order"""
+        self.chunk_file.flush()
+        with open(self.chunks_path, "r", encoding="utf-8") as f:
+            for line in itertools.islice(f, self.rows):
+                record = json.loads(line)
+                yield record["name"], Document(page_content=record["text"], metadata=record["metadata"]), record["id"]
+
+    def batches(self, size):
+        """Yield ``(batch, vectors)`` back in spill order, ``size`` items at a time"""
+        vectors = self.vectors()
+        start = 0
+        for batch in batched(self.items(), size):
+            yield batch, np.asarray(vectors[start:start + len(batch)])
+            start += len(batch)
+
+    def state(self):
+        return {"rows": self.rows, "dim": self.dim}
+
+    def close(self):
+        self.vector_file.close()
+        self.chunk_file.close()
+
+
+class Checkpoint:
+    """Progress of a run, saved every INGEST_CHECKPOINT_CHUNKS chunks so a crash can resume.
+
+    ``files`` is the manifest of what the store holds so far: finished files
+    carry their hash, files still being embedded have ``sha256`` None and the
+    chunks added or dropped so far, so resuming from it re-splits them and
+    embeds only the rest. The store itself is saved to CHECKPOINT_DIR under the output
+    directory, leaving the live index untouched until the run completes.
+    """
+
+    def __init__(self, output_dir=INGEST_OUTPUT_DIR, every=INGEST_CHECKPOINT_CHUNKS):
+        self.dir = os.path.join(output_dir, CHECKPOINT_DIR)
+        self.every = every
+        self.files = {}
+        self.final = {}
+        self.remaining = {}
+        self.dropped = collections.defaultdict(set)
+        self.since_save = 0
+
+    def load(self):
+        """The saved progress as a manifest, or None when there is nothing to resume"""
+        try:
+            with open(os.path.join(self.dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("settings") != ingest_settings():
+            logging.info("Ingest settings changed since the checkpoint, discarding it.")
+            return None
+        return manifest
+
+    def clear(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def start(self, manifest, files, changed, stale_ids):
+        """Record what the store holds once ``stale_ids`` are deleted"""
+        self.final = files
+        self.remaining = {name: new_count for name, (_, _, new_count) in changed.items() if new_count}
+        self.files = {}
+        for name, entry in files.items():
+            if name not in self.remaining:
+                self.files[name] = entry
+            elif manifest and name in manifest["files"]:
+                previous = manifest["files"][name]
+                kept = [doc_id for doc_id in previous["chunks"] if doc_id not in stale_ids]
+                # Duplicates being re-checked were cleared by plan_changes and must stay unhandled
+                self.files[name] = {"sha256": None, "chunks": kept, "duplicates": list(entry["duplicates"])}
+
+    def entry(self, name):
+        return self.files.setdefault(name, {"sha256": None, "chunks": [], "duplicates": []})
+
+    def done(self, name):
+        self.remaining[name] -= 1
+        if self.remaining[name]:
+            return
+        final = self.final[name]
+        dropped = self.dropped.pop(name, set())
+        self.files[name] = {
+            "sha256": final["sha256"],
+            "chunks": [doc_id for doc_id in final["chunks"] if doc_id not in dropped],
+            "duplicates": final["duplicates"] + sorted(dropped),
+        }
+
+    def added(self, batch):
+        for name, _, doc_id in batch:
+            self.entry(name)["chunks"].append(doc_id)
+            self.done(name)
+        self.since_save += len(batch)
+
+    def skipped(self, item):
+        name, _, doc_id = item
+        self.entry(name)["duplicates"].append(doc_id)
+        self.dropped[name].add(doc_id)
+        self.done(name)
+
+    def save_if_due(self, store, copy=None, spill=None):
+        """Save progress; before training there is no ``store`` and the ``spill`` holds it all"""
+        if self.every < 1 or self.since_save < self.every:
+            return
+        started = time.perf_counter()
+        os.makedirs(self.dir, exist_ok=True)
+        if store is not None:
+            store.save_local(self.dir)
+        if copy is not None:
+            copy.flush()
+        if spill is not None:
+            spill.flush()
+        path = os.path.join(self.dir, MANIFEST_NAME)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "settings": ingest_settings(),
+                "files": self.files,
+                "ntotal": 0 if store is None else store.index.ntotal,
+                "vectors": None if copy is None else copy.rows,
+                "vectors_part": None if copy is None else os.path.basename(copy.part_path),
+                "training": None if store is not None or spill is None else spill.state(),
+            }, f)
+        # The manifest is written last, so a crash mid-save leaves the previous checkpoint usable
+        os.replace(f"{path}.tmp", path)
+        self.since_save = 0
+        saved = spill.rows if store is None else store.index.ntotal
+        logging.info("Checkpoint: %d vectors saved in %.1fs.", saved, time.perf_counter() - started)
+
+
+def add_chunks(store, items, total, embeddings=None, pool=None, batch_size=INGEST_BATCH_SIZE,
+               copy=None, checkpoint=None, spill=None):
+    """Embed ``(name, chunk, doc_id)`` items and add them to ``store`` one batch per call.
+
+    ``items`` is consumed lazily, so only the batches being embedded are in
+    memory. Creates the store when ``store`` is None; for index types that
+    need training, batches then go to ``spill`` until VECTOR_INDEX_TRAIN_SAMPLE
+    vectors (or all of them) are embedded and are added from it after
+    training, so pass a TrainingSpill in that case. ``embeddings`` is also what
+    a new store uses for queries; it may be None when the actors did the
+    embedding. Each batch's vectors are appended to ``copy`` when given.
+    Returns the store and the chunks/sec achieved.
+    """
+    started = time.perf_counter()
+    done = 0
+
+    def commit(batch, vectors, record=True):
+        add_batch(store, batch, vectors)
+        if copy is not None:
+            copy.append(vectors)
+        if record and checkpoint is not None:
+            checkpoint.added(batch)
+
+    def train():
+        nonlocal store
+        store = new_store(embeddings, spill.vectors())
+        # Already recorded in the checkpoint when they were spilled
+        for spilled, spilled_vectors in spill.batches(batch_size):
+            commit(spilled, spilled_vectors, record=False)
+        spill.close()
+
+    for batch, vectors in embed_batches(batched(items, batch_size), embeddings, pool):
+        done += len(batch)
+        if store is not None:
+            commit(batch, vectors)
+        elif spill is None:
+            store = new_store(embeddings, vectors)
+            commit(batch, vectors)
+        else:
+            spill.append(batch, vectors)
+            if checkpoint is not None:
+                checkpoint.added(batch)
+            if spill.rows >= vector_index.VECTOR_INDEX_TRAIN_SAMPLE:
+                train()
+        if checkpoint is not None:
+            checkpoint.save_if_due(store, copy, spill if store is None else None)
+
+        elapsed = time.perf_counter() - started
+        logging.info("Embedded %d/%d chunks (%.1f chunks/sec)", done, total, done / elapsed)
+
+    if store is None and spill is not None and spill.rows:
+        # Fewer chunks than the training sample: train on all of them
+        train()
+    return store, done / max(time.perf_counter() - started, 1e-9)
+
+
+def save_lexical_index(store, output_dir=INGEST_OUTPUT_DIR):
+    """Rebuild the BM25 index over the store's chunks, in FAISS position order"""
+    started = time.perf_counter()
+    texts = (
+        store.docstore.search(store.index_to_docstore_id[position]).page_content
+        for position in range(store.index.ntotal)
+    )
+    lexical = BM25Index.build(texts)
+    lexical.save(os.path.join(output_dir, BM25_FILE))
+    stats = lexical.stats()
+    logging.info(
+        "BM25 index: %d terms, %d postings, %.1f MB in %.1fs.",
+        stats["terms"], stats["postings"], stats["bytes"] / (1024 * 1024), time.perf_counter() - started,
+    )
+
+
+def save_full_vectors(store, copy, output_dir=INGEST_OUTPUT_DIR):
+    """Write the float32 copy used to re-rank a quantized index, or drop a stale one.
+
+    Call after ``store.save_local``, which writes the index.faiss it reports on.
+    """
+    path = os.path.join(output_dir, vector_index.VECTORS_FILE)
+    if copy is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    copy.save(path, store.index.d)
+    logging.info(
+        "Index holds %.1f MB of codes; %.1f MB of float32 vectors saved for re-ranking.",
+        os.path.getsize(os.path.join(output_dir, "index.faiss")) / (1024 * 1024),
+        os.path.getsize(path) / (1024 * 1024),
+    )
+
+
+def main():
+    checkpoint = Checkpoint()
+    resumed = checkpoint.load() if INGEST_RESUME else None
+    if resumed is None:
+        checkpoint.clear()
+        manifest = None if INGEST_REBUILD else load_manifest()
     else:
-        text_content = ""  # Default to empty string if no text method is available
+        logging.info("Resuming from the checkpoint in %s.", checkpoint.dir)
+        manifest = resumed
 
-    texts.extend(text_splitter.split_text(text_content))
+    logging.info("Hashing %s and splitting new or changed files...", INGEST_DATA_DIR)
+    files, changed, stale_ids = plan_changes(list_sources(), manifest)
+    untrained = bool(resumed and resumed.get("training"))
+    if needs_rebuild(manifest, stale_ids, untrained):
+        if untrained:
+            logging.info("Chunks embedded before the index was trained have changed, starting over.")
+        else:
+            logging.info("%s indexes cannot delete vectors in place, rebuilding.", vector_index.VECTOR_INDEX_TYPE)
+        checkpoint.clear()
+        manifest = resumed = None
+        files, changed, stale_ids = plan_changes(list_sources(), manifest)
+    total = sum(new_count for _, _, new_count in changed.values())
+    logging.info("%d files: %d chunks to embed, %d chunks to remove.", len(files), total, len(stale_ids))
+    if manifest and not resumed and not total and not stale_ids:
+        if files != manifest["files"]:
+            save_manifest(files)
+        if not os.path.exists(os.path.join(INGEST_OUTPUT_DIR, BM25_FILE)):
+            save_lexical_index(FAISS.load_local(INGEST_OUTPUT_DIR, None, allow_dangerous_deserialization=True))
+        logging.info("Index is up to date.")
+        return
+    if not files:
+        logging.warning("No text found in %s, nothing to index.", INGEST_DATA_DIR)
+        return
 
-# Define embedding function
-def embedding_function(text):
-    embeddings_model = HuggingFaceEmbeddings(model_name="law-ai/InLegalBERT")
-    return embeddings_model.embed_query(text)
+    pool = start_actor_pool() if total else None
+    embeddings = None
+    if pool is None and total:
+        logging.info("Loading embedding model %s...", EMBEDDING_MODEL)
+        embeddings = load_embeddings()
 
-# Create FAISS index for embeddings
-index = IndexFlatL2(768)  # Dimension of embeddings, adjust as needed
+    store = None
+    copy = None
+    spill = None
+    os.makedirs(checkpoint.dir, exist_ok=True)
+    part_path = os.path.join(checkpoint.dir, f"{vector_index.VECTORS_FILE}.part")
+    if resumed and resumed.get("training"):
+        # Interrupted before the index was trained: the spill holds everything so far
+        spill = TrainingSpill(checkpoint.dir, **resumed["training"])
+        if resumed["vectors"] is not None:
+            copy = VectorCopy(part_path)
+    elif resumed:
+        store = FAISS.load_local(checkpoint.dir, embeddings, allow_dangerous_deserialization=True)
+        if store.index.ntotal != resumed["ntotal"]:
+            raise RuntimeError(f"Checkpoint in {checkpoint.dir} is inconsistent; delete it and re-run.")
+        if resumed["vectors"] is not None:
+            if resumed.get("vectors_part"):
+                part_path = os.path.join(checkpoint.dir, resumed["vectors_part"])
+            copy = VectorCopy.resume(part_path, resumed["vectors"], store, stale_ids)
+    elif manifest:
+        store = FAISS.load_local(INGEST_OUTPUT_DIR, embeddings, allow_dangerous_deserialization=True)
+        if vector_index.is_quantized():
+            copy = VectorCopy.from_previous(part_path, store, stale_ids)
+    elif vector_index.is_quantized():
+        copy = VectorCopy(part_path)
+    if store is None and spill is None and vector_index.needs_training():
+        spill = TrainingSpill(checkpoint.dir)
+    if store is not None:
+        vector_index.tune(store.index)
+        if stale_ids:
+            store.delete(list(stale_ids))
+    checkpoint.start(manifest, files, changed, stale_ids)
 
-# Assuming docstore as a simple dictionary to store document texts
-docstore = {i: text for i, text in enumerate(texts)}
-index_to_docstore_id = {i: i for i in range(len(texts))}
+    items = iter_new_chunks(changed)
+    near_duplicates = None
+    if INGEST_DEDUP_THRESHOLD > 0 and total:
+        near_duplicates = seed_near_duplicates(store, spill)
+        items = drop_near_duplicates(items, near_duplicates, checkpoint.skipped)
 
-# Initialize FAISS
-faiss_db = FAISS(embedding_function, index, docstore, index_to_docstore_id)
+    logging.info("Embedding in batches of %d...", INGEST_BATCH_SIZE)
+    try:
+        store, rate = add_chunks(
+            store, items, total, embeddings, pool, copy=copy, checkpoint=checkpoint, spill=spill
+        )
+    finally:
+        if pool is not None:
+            ray.shutdown()
+    if near_duplicates is not None:
+        stats = near_duplicates.stats()
+        logging.info(
+            "Dropped %d of %d new chunks as near-duplicates (threshold %.2f).",
+            stats["dropped"], stats["checked"], INGEST_DEDUP_THRESHOLD,
+        )
+    if store is None:
+        logging.warning("No chunks to index in %s.", INGEST_DATA_DIR)
+        checkpoint.clear()
+        return
 
-# Process and store embeddings
-logging.info("Storing embeddings in FAISS...")
-for i, text in enumerate(texts):
-    embedding = embedding_function(text)
-    faiss_db.add_documents([embedding])
+    # Exporting the vector embeddings database with logging
+    logging.info("Saving the vector embeddings database to %s...", INGEST_OUTPUT_DIR)
+    store.save_local(INGEST_OUTPUT_DIR)
+    save_full_vectors(store, copy)
+    # Positions shift when vectors are deleted, so the lexical index is rebuilt every run
+    save_lexical_index(store)
+    save_manifest(checkpoint.files)
+    checkpoint.clear()
 
-# Exporting the vector embeddings database with logging
-logging.info("Exporting the vector embeddings database...")
-faiss_db.save_local("ipc_embed_db")
+    logging.info(
+        "Process completed successfully: %d vectors, %d embedded at %.1f chunks/sec, %d removed.",
+        store.index.ntotal, total - (near_duplicates.dropped if near_duplicates else 0), rate, len(stale_ids),
+    )
 
-# Log a message to indicate the completion of the process
-logging.info("Process completed successfully.")
 
-# Shutdown Ray after the process
-ray.shutdown()
+if __name__ == "__main__":
+    main()
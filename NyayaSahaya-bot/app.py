@@ -1,17 +1,156 @@
-from fastapi import FastAPI, Request, File, UploadFile
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import requests
+from fastapi.responses import JSONResponse, StreamingResponse
+from contextlib import asynccontextmanager
+import aiohttp
+import asyncio
 import os
+import sys
 from dotenv import load_dotenv
-import re
-import PyPDF2
-import io
 import json
+from json_extract import StreamingJSONExtractor, extract_json_from_response
+from response_cache import ResponseCache, make_cache_key
+from single_flight import SingleFlight
+from pipeline import run_stages
+from prompts import (
+    build_analysis_prompt,
+    build_risk_prompt,
+    build_strength_prompt,
+    build_precedent_prompt,
+    build_precedent_notes_prompt,
+    build_timeline_prompt,
+    build_evidence_prompt,
+    build_chunk_facts_prompt,
+)
+from session_store import create_session_store
+from scheduler import ModelScheduler, SchedulerBusy, PRIORITY_INTERACTIVE, PRIORITY_BULK
+from generation import generation_options
+from long_document import plan_chunks, merge_chunk_facts, format_digest
+from retrieval import load_retriever
+from precedents import PRECEDENT_EXPLAIN, PRECEDENT_MAX_K, PRECEDENT_TOP_K, format_precedent, load_precedents
+from section_index import SectionIndex, parse_reference
+from datetime import date
+
+# pdf_extract lives at the repository root and is shared with pdf_to_text_api.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from extraction_cache import get_extraction_cache
+from pdf_extract import extract_pdf_pages_cached, shutdown_pool
+from upload_buffer import UPLOAD_MAX_BYTES, InvalidUpload, UploadTooLarge, content_length_exceeds, receive_upload
 
 load_dotenv()
 
-app = FastAPI()
+
+# Ollama configuration
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "mistral")  # Changed to mistral
+
+# Connection pool shared by every request in this process
+OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "16"))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "10"))
+OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "300"))  # 5 minutes for long generations
+OLLAMA_KEEPALIVE = float(os.getenv("OLLAMA_KEEPALIVE", "60"))
+
+# Cache for parsed JSON analyses; the disk tier is enabled by setting a directory
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+RESPONSE_CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR") or None
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_DIR, RESPONSE_CACHE_TTL)
+ollama_flights = SingleFlight()
+
+# Admission control in front of Ollama
+MODEL_MAX_CONCURRENCY = int(os.getenv("MODEL_MAX_CONCURRENCY", "4"))
+MODEL_MAX_QUEUE = int(os.getenv("MODEL_MAX_QUEUE", "64"))
+
+model_scheduler = ModelScheduler(MODEL_MAX_CONCURRENCY, MODEL_MAX_QUEUE)
+
+# Documents longer than this are analysed map-reduce style in chunks
+LONG_DOCUMENT_CHARS = int(os.getenv("LONG_DOCUMENT_CHARS", "12000"))
+DOCUMENT_CHUNK_CHARS = int(os.getenv("DOCUMENT_CHUNK_CHARS", "6000"))
+DOCUMENT_DIGEST_CHARS = int(os.getenv("DOCUMENT_DIGEST_CHARS", "8000"))
+# Bound on map calls per document; chunks grow up to DOCUMENT_MAX_CHUNK_CHARS to stay under it
+DOCUMENT_MAX_CHUNKS = int(os.getenv("DOCUMENT_MAX_CHUNKS", "16"))
+DOCUMENT_MAX_CHUNK_CHARS = int(os.getenv("DOCUMENT_MAX_CHUNK_CHARS", "24000"))
+DOCUMENT_MAP_CONCURRENCY = int(os.getenv("DOCUMENT_MAP_CONCURRENCY", "4"))
+
+_ollama_session = None
+
+
+def get_ollama_session():
+    """Return the process-wide aiohttp session, creating it on first use"""
+    global _ollama_session
+    if _ollama_session is None or _ollama_session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=OLLAMA_POOL_SIZE,
+            limit_per_host=OLLAMA_POOL_SIZE,
+            keepalive_timeout=OLLAMA_KEEPALIVE,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=None,
+            sock_connect=OLLAMA_CONNECT_TIMEOUT,
+            sock_read=OLLAMA_READ_TIMEOUT,
+        )
+        _ollama_session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    return _ollama_session
+
+
+async def close_ollama_session():
+    global _ollama_session
+    if _ollama_session is not None and not _ollama_session.closed:
+        await _ollama_session.close()
+    _ollama_session = None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global conversations, retriever, precedent_index, section_index
+    # Start-up work lives here, not at module level: the PDF pool's spawn
+    # workers re-import __main__, which is this file under `python app.py`
+    print(f"🚀 Starting NyayaSahaya API")
+    print(f"📡 Ollama URL: {OLLAMA_URL}")
+    print(f"🤖 Ollama Model: {OLLAMA_MODEL}")
+    print(f"🔌 Ollama pool size: {OLLAMA_POOL_SIZE}")
+    conversations = create_session_store()
+    section_index = SectionIndex.load()
+    print(f"📖 Section index: {len(section_index)} BNS sections, {len(section_index.by_ipc)} IPC sections mapped")
+    get_ollama_session()
+    # Loads the embedding model too, so keep it off the event loop
+    retriever = await asyncio.to_thread(load_retriever)
+    precedent_index = await asyncio.to_thread(load_precedents)
+    yield
+    await close_ollama_session()
+    shutdown_pool()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.exception_handler(SchedulerBusy)
+async def scheduler_busy_handler(request, exc):
+    return JSONResponse(
+        {"error": "Server is busy, please retry shortly", "retry_after": exc.retry_after},
+        status_code=429,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(UploadTooLarge)
+async def upload_too_large_handler(request, exc):
+    return JSONResponse({"error": str(exc), "max_bytes": exc.limit}, status_code=413)
+
+
+@app.exception_handler(InvalidUpload)
+async def invalid_upload_handler(request, exc):
+    return JSONResponse({"error": str(exc)}, status_code=400)
+
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    # Refuse before the multipart body is received when the size is declared
+    if request.url.path == "/api/upload-evidence" and content_length_exceeds(request.headers):
+        return await upload_too_large_handler(request, UploadTooLarge(UPLOAD_MAX_BYTES))
+    return await call_next(request)
+
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,50 +160,16 @@ app.add_middleware(
     allow_credentials=True,
 )
 
-# Ollama configuration
-OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
-OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "mistral")  # Changed to mistral
-
-print(f"🚀 Starting NyayaSahaya API")
-print(f"📡 Ollama URL: {OLLAMA_URL}")
-print(f"🤖 Ollama Model: {OLLAMA_MODEL}")
-
-# In-memory conversation history
-conversations = {}
+# Conversation history, bounded in memory or shared through SQLite (SESSION_STORE); set up in lifespan
+conversations = None
 
-def extract_json_from_response(text):
-    """Extract JSON from markdown code blocks or raw text"""
-    if isinstance(text, dict):
-        return text
-    if isinstance(text, list):
-        return text
-    
-    text = str(text).strip()
-    
-    # Try direct JSON parse first
-    try:
-        return json.loads(text)
-    except:
-        pass
-    
-    # Extract from markdown code blocks
-    patterns = [
-        r'```json\s*(\{.*?\}|\[.*?\])\s*```',
-        r'```\s*(\{.*?\}|\[.*?\])\s*```',
-        r'(\{[^{}]*"[^"]*"[^{}]*:.*?\})',
-        r'(\[[^\[\]]*\{.*?\}[^\[\]]*\])'
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text, re.DOTALL)
-        if match:
-            try:
-                return json.loads(match.group(1))
-            except:
-                continue
-    
-    return None
+# Retrieval over ipc_embed_db, set up in lifespan; None when the index is missing
+retriever = None
+# Search over the ingested judgment corpus in precedent_db; None falls back to LLM-generated precedents
+precedent_index = None
 
+# BNS section texts and IPC correspondences for direct lookups, set up in lifespan
+section_index = None
 
 def get_default_responses():
     """Fallback responses when parsing fails"""
@@ -126,89 +231,290 @@ def get_default_responses():
     }
 
 
-def call_ollama(prompt, system_prompt=None, conversation_id="default", expect_json=False):
-    """Call Ollama API with optimized settings for long documents"""
-    
-    if conversation_id not in conversations:
-        conversations[conversation_id] = []
-    
+async def cache_call(method, *args):
+    """Call a response cache method, in a thread when its disk tier is enabled"""
+    if response_cache.blocking:
+        return await asyncio.to_thread(method, *args)
+    return method(*args)
+
+
+async def session_call(method, *args):
+    """Call a session store method, in a thread when the store can block on I/O"""
+    if conversations.blocking:
+        return await asyncio.to_thread(method, *args)
+    return method(*args)
+
+
+async def build_messages(prompt, system_prompt=None, conversation_id="default", expect_json=False):
+    """Assemble the Ollama chat messages, including history for chat turns"""
     messages = []
     if system_prompt:
         messages.append({"role": "system", "content": system_prompt})
     
     if not expect_json:
-        messages.extend(conversations[conversation_id])
+        messages.extend(await session_call(conversations.get, conversation_id))
     
     messages.append({"role": "user", "content": prompt})
-    
+    return messages
+
+
+def build_ollama_payload(messages, expect_json=False, stream=False, profile=None):
+    if profile is None:
+        profile = "analysis" if expect_json else "chat"
+    options = generation_options(messages, profile)
+    print(f"[DEBUG] Profile: {profile}, num_ctx: {options['num_ctx']}, num_predict: {options['num_predict']}")
+    return {
+        "model": OLLAMA_MODEL,
+        "messages": messages,
+        "stream": stream,
+        "format": "json" if expect_json else None,
+        "options": options
+    }
+
+
+async def remember_turn(conversation_id, prompt, assistant_message):
+    """Append a finished chat turn to the session history; the store trims old messages"""
+    await session_call(conversations.append, conversation_id, "user", prompt)
+    await session_call(conversations.append, conversation_id, "assistant", assistant_message)
+
+
+async def post_ollama(payload, prompt, priority=PRIORITY_BULK):
+    """Send one non-streaming chat request and return the assistant text.
+
+    Waits for a model slot first; SchedulerBusy propagates to the endpoint.
+    """
     print(f"\n[DEBUG] 📤 Calling Ollama...")
     print(f"[DEBUG] Model: {OLLAMA_MODEL}")
-    print(f"[DEBUG] Expect JSON: {expect_json}")
     print(f"[DEBUG] Prompt length: {len(prompt)} chars")
     
-    try:
-        response = requests.post(
-            f"{OLLAMA_URL}/api/chat",
-            json={
-                "model": OLLAMA_MODEL,
-                "messages": messages,
-                "stream": False,
-                "format": "json" if expect_json else None,
-                "options": {
-                    "temperature": 0.3 if expect_json else 0.7,
-                    "num_predict": 2048,      # Allow longer responses
-                    "num_ctx": 16384,         # Large context window for long docs
-                    "top_p": 0.9,
-                    "repeat_penalty": 1.1
-                }
-            },
-            timeout=300  # 5 minutes timeout
-        )
-        
-        print(f"[DEBUG] ✅ Response status: {response.status_code}")
+    async with model_scheduler.slot(priority):
+        try:
+            session = get_ollama_session()
+            async with session.post(
+                f"{OLLAMA_URL}/api/chat",
+                json=payload,
+            ) as response:
+                print(f"[DEBUG] ✅ Response status: {response.status}")
+            
+                if response.status != 200:
+                    print(f"[DEBUG] ❌ Ollama error status: {response.status}")
+                    return None
+            
+                result = await response.json(content_type=None)
         
-        if response.status_code == 200:
-            result = response.json()
             assistant_message = result["message"]["content"]
-            
+        
             print(f"[DEBUG] 📨 Response length: {len(assistant_message)} chars")
             print(f"[DEBUG] 📨 Response preview: {assistant_message[:150]}...")
-            
-            if not expect_json:
-                conversations[conversation_id].append({"role": "user", "content": prompt})
-                conversations[conversation_id].append({"role": "assistant", "content": assistant_message})
-                
-                if len(conversations[conversation_id]) > 6:
-                    conversations[conversation_id] = conversations[conversation_id][-6:]
-            
-            if expect_json:
-                parsed = extract_json_from_response(assistant_message)
-                if parsed:
-                    print(f"[DEBUG] ✅ JSON parsed successfully")
-                    return parsed
-                print(f"[DEBUG] ⚠️ JSON parse failed, returning raw")
-                return assistant_message
-            
             return assistant_message
-        else:
-            print(f"[DEBUG] ❌ Ollama error status: {response.status_code}")
+            
+        except asyncio.TimeoutError:
+            print("[DEBUG] ❌ Request timed out - document might be too long or model too slow")
+            return None
+        except aiohttp.ClientConnectionError:
+            print("[DEBUG] ❌ Cannot connect to Ollama - is 'ollama serve' running?")
             return None
+        except Exception as e:
+            print(f"[DEBUG] ❌ Exception: {e}")
+            return None
+
+
+async def stream_ollama_json(payload, prompt, priority=PRIORITY_BULK):
+    """Stream a JSON prompt and stop reading once the top-level value closes.
+
+    Returns ``(parsed, raw_text)``. Closing the response early makes Ollama
+    abandon the rest of the generation (format=json tends to pad the answer
+    with whitespace until num_predict), which frees the model slot sooner.
+    """
+    print(f"\n[DEBUG] 📤 Calling Ollama (JSON stream)...")
+    print(f"[DEBUG] Model: {OLLAMA_MODEL}")
+    print(f"[DEBUG] Prompt length: {len(prompt)} chars")
+    
+    extractor = StreamingJSONExtractor()
+    async with model_scheduler.slot(priority):
+        try:
+            session = get_ollama_session()
+            async with session.post(
+                f"{OLLAMA_URL}/api/chat",
+                json={**payload, "stream": True},
+            ) as response:
+                print(f"[DEBUG] ✅ Response status: {response.status}")
+                
+                if response.status != 200:
+                    print(f"[DEBUG] ❌ Ollama error status: {response.status}")
+                    return None, None
+                
+                async for line in response.content:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if extractor.feed(chunk.get("message", {}).get("content", "")) is not None:
+                        if not chunk.get("done"):
+                            print(f"[DEBUG] ✂️ Top-level JSON closed, stopping generation early")
+                        break
+                    if chunk.get("done"):
+                        break
             
-    except requests.exceptions.Timeout:
-        print("[DEBUG] ❌ Request timed out - document might be too long or model too slow")
-        return None
-    except requests.exceptions.ConnectionError:
-        print("[DEBUG] ❌ Cannot connect to Ollama - is 'ollama serve' running?")
-        return None
-    except Exception as e:
-        print(f"[DEBUG] ❌ Exception: {e}")
+            raw = extractor.text()
+            print(f"[DEBUG] 📨 Response length: {len(raw)} chars")
+            print(f"[DEBUG] 📨 Response preview: {raw[:150]}...")
+            return extractor.value, raw
+        
+        except asyncio.TimeoutError:
+            print("[DEBUG] ❌ Request timed out - document might be too long or model too slow")
+            return None, None
+        except aiohttp.ClientConnectionError:
+            print("[DEBUG] ❌ Cannot connect to Ollama - is 'ollama serve' running?")
+            return None, None
+        except Exception as e:
+            print(f"[DEBUG] ❌ Exception: {e}")
+            return None, None
+
+
+async def fetch_json(payload, prompt, cache_key, priority):
+    """Run a JSON prompt and cache the parsed result.
+
+    Only a whole top-level value is cached; JSON salvaged from inside a
+    malformed answer is returned for this request alone.
+    """
+    parsed, raw = await stream_ollama_json(payload, prompt, priority)
+    if not raw:
         return None
+    
+    if parsed:
+        print(f"[DEBUG] ✅ JSON parsed successfully")
+        await cache_call(response_cache.set, cache_key, parsed)
+        return parsed
+    salvaged = extract_json_from_response(raw)
+    if salvaged:
+        print(f"[DEBUG] ⚠️ Answer was malformed, using JSON nested inside it (not cached)")
+        return salvaged
+    print(f"[DEBUG] ⚠️ JSON parse failed, returning raw")
+    return raw
+
+
+async def call_ollama(prompt, system_prompt=None, conversation_id="default", expect_json=False, priority=None, profile=None):
+    """Call Ollama API with optimized settings for long documents"""
+    
+    if priority is None:
+        priority = PRIORITY_BULK if expect_json else PRIORITY_INTERACTIVE
+    
+    messages = await build_messages(prompt, system_prompt, conversation_id, expect_json)
+    payload = build_ollama_payload(messages, expect_json, profile=profile)
+    
+    if not expect_json:
+        assistant_message = await post_ollama(payload, prompt, priority)
+        if assistant_message:
+            await remember_turn(conversation_id, prompt, assistant_message)
+        return assistant_message
+    
+    cache_key = make_cache_key(payload)
+    cached = await cache_call(response_cache.get, cache_key)
+    if cached is not None:
+        print(f"\n[DEBUG] ⚡ Cache hit for JSON prompt ({len(prompt)} chars)")
+        return cached
+    
+    # Identical prompts already in flight share that upstream call
+    return await ollama_flights.do(cache_key, lambda: fetch_json(payload, prompt, cache_key, priority))
+
+
+async def stream_ollama(prompt, system_prompt=None, conversation_id="default"):
+    """Yield chat tokens from Ollama as they are generated.
+
+    The finished turn is added to the session history once Ollama reports
+    ``done``; an interrupted stream leaves the history untouched.
+    """
+    messages = await build_messages(prompt, system_prompt, conversation_id)
+    print(f"[DEBUG] Streaming from Ollama, prompt length: {len(prompt)} chars")
+    
+    async with model_scheduler.slot(PRIORITY_INTERACTIVE):
+        session = get_ollama_session()
+        async with session.post(
+            f"{OLLAMA_URL}/api/chat",
+            json=build_ollama_payload(messages, stream=True, profile="chat"),
+        ) as response:
+            if response.status != 200:
+                raise RuntimeError(f"Ollama error status: {response.status}")
+        
+            parts = []
+            done = False
+            # Ollama streams one JSON object per line
+            async for line in response.content:
+                line = line.strip()
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                token = chunk.get("message", {}).get("content", "")
+                if token:
+                    parts.append(token)
+                    yield token
+                if chunk.get("done"):
+                    done = True
+                    break
+    
+    assistant_message = "".join(parts)
+    if not done:
+        print(f"[DEBUG] ⚠️ Ollama stream ended without done after {len(assistant_message)} chars, not saving the turn")
+        return
+    print(f"[DEBUG] 📨 Streamed {len(assistant_message)} chars")
+    await remember_turn(conversation_id, prompt, assistant_message)
+
+
+def sse_event(data, event=None):
+    """Format one Server-Sent Event frame"""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data)}\n\n"
 
 
 # Legal prompt template
 LEGAL_SYSTEM_PROMPT = """You are NyayaSahaya, an AI legal assistant specializing in Indian law. Be accurate, concise, and helpful."""
 
 
+def section_lookup(question):
+    """Resolve a section number named in the question: ``(answer, context)``.
+
+    Pure lookups ("what is section 318 BNS") get ``answer``, sent without
+    calling the model. Other questions naming a section get the section text
+    as ``context`` for the prompt. Both are None when no known section is named.
+    """
+    reference = parse_reference(question)
+    if reference is None or section_index is None:
+        return None, None
+    number, code, lookup_only = reference
+    text = section_index.describe(number, code)
+    if text is None:
+        return None, None
+    print(f"[SECTIONS] ⚡ {code.upper()} {number} ({'answer' if lookup_only else 'context'})")
+    return (text, None) if lookup_only else (None, text)
+
+
+async def chat_system_prompt(question, section_context=None):
+    """LEGAL_SYSTEM_PROMPT grounded with the exact section named or the closest BNS passages"""
+    if section_context:
+        return (
+            f"{LEGAL_SYSTEM_PROMPT}\n\n"
+            "The question refers to this section of the BNS handbook. Base your answer on it:\n\n"
+            f"{section_context}"
+        )
+    if retriever is None:
+        return LEGAL_SYSTEM_PROMPT
+    try:
+        context, hits = await asyncio.to_thread(retriever.context, question)
+    except Exception as e:
+        print(f"[RETRIEVAL] ⚠️ Search failed, answering without context: {e}")
+        return LEGAL_SYSTEM_PROMPT
+    if not context:
+        return LEGAL_SYSTEM_PROMPT
+    print(f"[RETRIEVAL] {len(hits)} passages, {len(context)} chars of context")
+    return (
+        f"{LEGAL_SYSTEM_PROMPT}\n\n"
+        "Base your answer on these excerpts from the BNS handbook when they are relevant, "
+        "and cite the section numbers they mention:\n\n"
+        f"{context}"
+    )
+
+
 @app.post("/api/chat")
 async def chat(request: Request):
     """Chat endpoint"""
@@ -222,20 +528,289 @@ async def chat(request: Request):
         if not question:
             return JSONResponse({"error": "Question is required"}, status_code=400)
 
-        answer = call_ollama(question, LEGAL_SYSTEM_PROMPT, session_id, expect_json=False)
+        direct_answer, section_context = section_lookup(question)
+        if direct_answer:
+            await remember_turn(session_id, question, direct_answer)
+            return {"answer": direct_answer, "source": "section_index"}
+        
+        system_prompt = await chat_system_prompt(question, section_context)
+        answer = await call_ollama(question, system_prompt, session_id, expect_json=False, profile="chat")
         
         if not answer:
             return {"answer": "I'm having trouble connecting. Please ensure Ollama is running with 'ollama serve'."}
             
         return {"answer": answer}
         
+    except SchedulerBusy:
+        raise
     except Exception as e:
         print(f"[ERROR] chat: {e}")
         return JSONResponse({"error": str(e)}, status_code=500)
 
 
+@app.post("/api/chat/stream")
+async def chat_stream(request: Request):
+    """Chat endpoint that streams tokens as Server-Sent Events"""
+    try:
+        data = await request.json()
+        question = data.get("question", "").strip()
+        session_id = data.get("session_id", "default")
+    except Exception as e:
+        print(f"[ERROR] chat_stream: {e}")
+        return JSONResponse({"error": "Request body must be a JSON object"}, status_code=400)
+    
+    print(f"\n[CHAT-STREAM] Question: {question[:100]}...")
+    
+    if not question:
+        return JSONResponse({"error": "Question is required"}, status_code=400)
+    
+    direct_answer, section_context = section_lookup(question)
+    if direct_answer:
+        await remember_turn(session_id, question, direct_answer)
+        
+        async def lookup_events():
+            yield sse_event({"token": direct_answer})
+            yield sse_event({"answer": direct_answer, "source": "section_index"}, event="done")
+        
+        return StreamingResponse(
+            lookup_events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    
+    # Reject before the stream starts; once headers are sent we can't return a 429
+    model_scheduler.check_capacity()
+    system_prompt = await chat_system_prompt(question, section_context)
+    
+    async def events():
+        parts = []
+        try:
+            async for token in stream_ollama(question, system_prompt, session_id):
+                parts.append(token)
+                yield sse_event({"token": token})
+            yield sse_event({"answer": "".join(parts)}, event="done")
+        except asyncio.TimeoutError:
+            print("[ERROR] chat_stream: timed out")
+            yield sse_event({"error": "Request timed out"}, event="error")
+        except aiohttp.ClientConnectionError:
+            print("[ERROR] chat_stream: cannot connect to Ollama")
+            yield sse_event({"error": "I'm having trouble connecting. Please ensure Ollama is running with 'ollama serve'."}, event="error")
+        except Exception as e:
+            print(f"[ERROR] chat_stream: {e}")
+            yield sse_event({"error": str(e)}, event="error")
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def condense_document(text):
+    """Map-reduce a long document into a digest of its facts that fits one prompt.
+
+    The text is split on section and paragraph boundaries into at most
+    DOCUMENT_MAX_CHUNKS chunks, facts are extracted from every chunk
+    concurrently, and the merged results are rendered as a bounded digest.
+    Returns ``(merged_facts, digest_text)``.
+    """
+    chunks, total = plan_chunks(text, DOCUMENT_CHUNK_CHARS, DOCUMENT_MAX_CHUNKS, DOCUMENT_MAX_CHUNK_CHARS)
+    print(f"[CHUNKS] Splitting {len(text)} chars into {len(chunks)} chunks")
+    if total > len(chunks):
+        print(f"[CHUNKS] ⚠️ Document needs {total} chunks, reading {len(chunks)} spread across it")
+    
+    semaphore = asyncio.Semaphore(DOCUMENT_MAP_CONCURRENCY)
+    
+    async def extract(number, chunk):
+        async with semaphore:
+            return await call_ollama(build_chunk_facts_prompt(chunk, number, len(chunks)), expect_json=True, profile="chunk_facts")
+    
+    results = await asyncio.gather(*(extract(i + 1, chunk) for i, chunk in enumerate(chunks)))
+    merged = merge_chunk_facts(results)
+    
+    digest = format_digest(merged, DOCUMENT_DIGEST_CHARS)
+    if not digest:
+        # Every map call failed; an empty digest would make unrelated documents share one prompt
+        print(f"[CHUNKS] ⚠️ No facts extracted from {len(chunks)} chunks, using the start of the document")
+        return merged, f"(First part of a longer document)\n\n{text[:DOCUMENT_DIGEST_CHARS]}"
+    print(f"[CHUNKS] ✅ Digest of {len(digest)} chars from {len(chunks)} chunks")
+    return merged, f"(Condensed from a {len(chunks)}-part document)\n\n{digest}"
+
+
+def fill_from_chunks(analysis, merged):
+    """Fill list fields the final analysis left empty with the merged chunk facts"""
+    if not merged or not isinstance(analysis, dict):
+        return analysis
+    if not analysis.get("sections"):
+        analysis["sections"] = merged["sections"]
+    if not analysis.get("key_facts"):
+        analysis["key_facts"] = merged["facts"][:7]
+    if not analysis.get("legal_issues"):
+        analysis["legal_issues"] = merged["issues"]
+    return analysis
+
+
 # Enhanced prompts for more detailed legal analysis
 
+# The run_* helpers own their fallbacks so an endpoint and the same section of
+# /api/case-pipeline answer alike when the model or the prompt fails
+
+async def run_analysis(case_text):
+    merged = None
+    try:
+        if len(case_text) > LONG_DOCUMENT_CHARS:
+            merged, case_text = await condense_document(case_text)
+        answer = await call_ollama(build_analysis_prompt(case_text), expect_json=True, profile="analysis")
+    except SchedulerBusy:
+        raise
+    except Exception as e:
+        print(f"[ERROR] run_analysis: {e}")
+        return get_enhanced_fallback()["analysis"]
+    
+    if isinstance(answer, dict):
+        print(f"[ANALYZE] ✅ Detailed analysis complete")
+        return fill_from_chunks(answer, merged)
+    
+    # Enhanced fallback with more detail
+    return {
+        "case_type": "Civil",
+        "sub_category": "Contract Dispute - Payment Default",
+        "jurisdiction": "District Civil Court",
+        "court_location": "District Court at specified location",
+        "sections": ["Indian Contract Act, 1872 - Section 73 (Compensation for loss or damage)"],
+        "complexity_score": 65,
+        "urgency_level": "High",
+        "estimated_duration": "6-12 months",
+        "parties": {
+            "petitioner": "ABC Technologies Pvt. Ltd. (Technology Services Company)",
+            "petitioner_type": "Company",
+            "respondent": "XYZ Solutions Pvt. Ltd. (Client Company)",
+            "respondent_type": "Company",
+            "other_parties": []
+        },
+        "case_summary": "This is a civil complaint filed by ABC Technologies against XYZ Solutions for breach of contract and recovery of outstanding payments. The complainant provided software development services as per a written agreement, but the respondent failed to honor payment obligations despite repeated reminders and demand notices.",
+        "key_facts": [
+            "Written agreement executed between parties for software development services",
+            "Complainant ABC Technologies fulfilled all contractual obligations",
+            "Respondent XYZ Solutions defaulted on payment obligations",
+            "Multiple payment reminders sent but remained unaddressed",
+            "Cause of action arose upon payment default and continues"
+        ],
+        "legal_issues": [
+            "Breach of Contract - Non-payment of agreed consideration under Contract Act 1872",
+            "Recovery of Outstanding Amount - Specific Relief Act 1963",
+            "Awarding of Interest and Costs - Contract Act Section 73"
+        ],
+        "claimed_amount": "As per agreement plus interest",
+        "cause_of_action": "First arose on payment default date and continues",
+        "jurisdiction_basis": "Respondent conducts business within territorial jurisdiction",
+        "previous_proceedings": "None mentioned",
+        "statute_of_limitations": "Within limitation period",
+        "key_dates": {
+            "incident_date": "Date of agreement execution",
+            "filing_date": "Current filing",
+            "first_hearing": "To be scheduled"
+        }
+    }
+
+
+async def run_risk(case_details, evidence):
+    try:
+        answer = await call_ollama(build_risk_prompt(case_details, evidence), expect_json=True, profile="risk")
+    except SchedulerBusy:
+        raise
+    except Exception as e:
+        print(f"[ERROR] run_risk: {e}")
+        answer = None
+    
+    if isinstance(answer, dict):
+        return answer
+    
+    return get_enhanced_fallback()["risk"]
+
+
+async def run_strength(case_info, evidence_list):
+    try:
+        answer = await call_ollama(build_strength_prompt(case_info, evidence_list), expect_json=True, profile="strength")
+    except SchedulerBusy:
+        raise
+    except Exception as e:
+        print(f"[ERROR] run_strength: {e}")
+        answer = None
+    
+    if isinstance(answer, dict):
+        return answer
+    
+    return get_enhanced_fallback()["strength"]
+
+
+async def run_precedents(case_description, case_type, explain=PRECEDENT_EXPLAIN, k=PRECEDENT_TOP_K):
+    """Nearest cases from the precedent index, or LLM-generated ones when there is no index.
+
+    A failed index search raises rather than falling back to the made-up
+    default citations, which would read as real matches.
+    """
+    if precedent_index is None:
+        return await generate_precedents(case_description, case_type)
+    
+    query = f"{case_type}: {case_description}" if case_type else case_description
+    hits = await asyncio.to_thread(precedent_index.search, query, k)
+    precedents = [format_precedent(*hit) for hit in hits]
+    print(f"[PRECEDENTS] ⚡ {len(precedents)} matches from the precedent index")
+    if explain and precedents:
+        await explain_precedents(case_description, precedents)
+    return precedents
+
+
+async def explain_precedents(case_description, precedents):
+    """Replace the excerpt-based relevance/keyTakeaway of each hit with LLM-written text"""
+    try:
+        answer = await call_ollama(
+            build_precedent_notes_prompt(case_description, precedents), expect_json=True, profile="precedent_notes"
+        )
+    except Exception as e:
+        # The matches stand on their own; only the explanations are lost
+        print(f"[PRECEDENTS] ⚠️ Could not explain matches: {e}")
+        return
+    if not isinstance(answer, list):
+        return
+    for precedent, notes in zip(precedents, answer):
+        if isinstance(notes, dict):
+            for key in ("relevance", "keyTakeaway"):
+                if isinstance(notes.get(key), str) and notes[key]:
+                    precedent[key] = notes[key]
+
+
+async def generate_precedents(case_description, case_type):
+    try:
+        answer = await call_ollama(build_precedent_prompt(case_description, case_type), expect_json=True, profile="precedents")
+    except SchedulerBusy:
+        raise
+    except Exception as e:
+        print(f"[ERROR] generate_precedents: {e}")
+        answer = None
+    
+    if isinstance(answer, list):
+        return answer
+    
+    return get_default_responses()["precedents"]
+
+
+async def run_timeline(case_type, jurisdiction, filing_date):
+    try:
+        answer = await call_ollama(build_timeline_prompt(case_type, jurisdiction, filing_date), expect_json=True, profile="timeline")
+    except SchedulerBusy:
+        raise
+    except Exception as e:
+        print(f"[ERROR] run_timeline: {e}")
+        answer = None
+    
+    if isinstance(answer, list):
+        return answer
+    
+    return get_default_responses()["timeline"]
+
+
 @app.post("/api/analyze-case")
 async def analyze_case(request: Request):
     """Comprehensive legal document analysis"""
@@ -248,107 +823,10 @@ async def analyze_case(request: Request):
         if not case_text:
             return JSONResponse({"error": "Case text is required"}, status_code=400)
         
-        # Enhanced detailed analysis prompt
-        analysis_prompt = f"""You are a senior legal analyst. Perform a comprehensive analysis of this legal document.
-
-FULL LEGAL DOCUMENT:
-{case_text}
-
-Provide detailed analysis in this JSON format:
-{{
-    "case_type": "Criminal/Civil/Property/Family/Constitutional/Consumer",
-    "sub_category": "Specific type like Contract Dispute, Cheating, Property Transfer",
-    "jurisdiction": "Specify exact court - District Court/High Court/Supreme Court and state",
-    "court_location": "City or district name",
-    "sections": ["List ALL applicable sections with full names - e.g., IPC Section 420, Contract Act 1872 Section 73"],
-    "complexity_score": 75,
-    "urgency_level": "Critical/High/Medium/Low",
-    "estimated_duration": "Estimated time to resolution",
-    "parties": {{
-        "petitioner": "Full name and designation",
-        "petitioner_type": "Individual/Company/Government",
-        "respondent": "Full name and designation",
-        "respondent_type": "Individual/Company/Government",
-        "other_parties": ["List any other involved parties"]
-    }},
-    "case_summary": "Comprehensive 3-4 sentence summary of the entire case",
-    "key_facts": [
-        "Detailed fact 1 with dates and specifics",
-        "Detailed fact 2 with amounts and parties",
-        "Detailed fact 3 with legal implications",
-        "Include 5-7 comprehensive facts"
-    ],
-    "legal_issues": [
-        "Primary legal issue with statutory reference",
-        "Secondary legal issue with case law implications",
-        "Constitutional or procedural issues if any"
-    ],
-    "claimed_amount": "Amount in dispute if applicable",
-    "cause_of_action": "When and how the legal cause arose",
-    "jurisdiction_basis": "Why this court has jurisdiction",
-    "previous_proceedings": "Any prior legal action mentioned",
-    "statute_of_limitations": "Time limitation concerns if any",
-    "key_dates": {{
-        "incident_date": "Date of main incident",
-        "filing_date": "When case was filed",
-        "first_hearing": "Scheduled or expected date"
-    }}
-}}
-
-Be thorough and extract every relevant detail from the document."""
-        
-        answer = call_ollama(analysis_prompt, expect_json=True)
-        
-        if isinstance(answer, dict):
-            print(f"[ANALYZE] ✅ Detailed analysis complete")
-            return {"analysis": answer}
-        
-        parsed = extract_json_from_response(str(answer)) if answer else None
-        if parsed:
-            return {"analysis": parsed}
-        
-        # Enhanced fallback with more detail
-        return {"analysis": {
-            "case_type": "Civil",
-            "sub_category": "Contract Dispute - Payment Default",
-            "jurisdiction": "District Civil Court",
-            "court_location": "District Court at specified location",
-            "sections": ["Indian Contract Act, 1872 - Section 73 (Compensation for loss or damage)"],
-            "complexity_score": 65,
-            "urgency_level": "High",
-            "estimated_duration": "6-12 months",
-            "parties": {
-                "petitioner": "ABC Technologies Pvt. Ltd. (Technology Services Company)",
-                "petitioner_type": "Company",
-                "respondent": "XYZ Solutions Pvt. Ltd. (Client Company)",
-                "respondent_type": "Company",
-                "other_parties": []
-            },
-            "case_summary": "This is a civil complaint filed by ABC Technologies against XYZ Solutions for breach of contract and recovery of outstanding payments. The complainant provided software development services as per a written agreement, but the respondent failed to honor payment obligations despite repeated reminders and demand notices.",
-            "key_facts": [
-                "Written agreement executed between parties for software development services",
-                "Complainant ABC Technologies fulfilled all contractual obligations",
-                "Respondent XYZ Solutions defaulted on payment obligations",
-                "Multiple payment reminders sent but remained unaddressed",
-                "Cause of action arose upon payment default and continues"
-            ],
-            "legal_issues": [
-                "Breach of Contract - Non-payment of agreed consideration under Contract Act 1872",
-                "Recovery of Outstanding Amount - Specific Relief Act 1963",
-                "Awarding of Interest and Costs - Contract Act Section 73"
-            ],
-            "claimed_amount": "As per agreement plus interest",
-            "cause_of_action": "First arose on payment default date and continues",
-            "jurisdiction_basis": "Respondent conducts business within territorial jurisdiction",
-            "previous_proceedings": "None mentioned",
-            "statute_of_limitations": "Within limitation period",
-            "key_dates": {
-                "incident_date": "Date of agreement execution",
-                "filing_date": "Current filing",
-                "first_hearing": "To be scheduled"
-            }
-        }}
+        return {"analysis": await run_analysis(case_text)}
         
+    except SchedulerBusy:
+        raise
     except Exception as e:
         print(f"[ERROR] analyze_case: {e}")
         return {"analysis": get_enhanced_fallback()["analysis"]}
@@ -364,70 +842,10 @@ async def calculate_risk(request: Request):
         
         print(f"\n[RISK] Comprehensive risk analysis...")
         
-        risk_prompt = f"""As a legal risk analyst, provide detailed risk assessment:
-
-CASE DETAILS:
-Case Type: {case_details.get('case_type', 'Unknown')}
-Sub-Category: {case_details.get('sub_category', 'Not specified')}
-Legal Sections: {', '.join(case_details.get('sections', []))}
-Facts: {'; '.join(case_details.get('key_facts', [])[:3])}
-Parties: {case_details.get('parties', {}).get('petitioner', 'Unknown')} vs {case_details.get('parties', {}).get('respondent', 'Unknown')}
-Evidence Count: {len(evidence)}
-
-Provide comprehensive risk analysis in JSON:
-{{
-  "overall_risk": "Critical/High/Medium/Low",
-  "risk_score": 75,
-  "legal_penalty_probability": 65,
-  "financial_risk": 70,
-  "reputational_risk": 60,
-  "urgency_level": 85,
-  "risk_factors": [
-    {{
-      "factor": "Lack of documented evidence",
-      "severity": "High",
-      "impact": "Could weaken case substantially",
-      "mitigation": "Gather supporting documents immediately"
-    }},
-    {{
-      "factor": "Statute of limitations concern",
-      "severity": "Medium",
-      "impact": "May affect claim validity",
-      "mitigation": "Verify dates and file promptly"
-    }}
-  ],
-  "potential_penalties": {{
-    "criminal": "Details if criminal case",
-    "civil": "Monetary damages, costs, interest",
-    "administrative": "Any regulatory penalties"
-  }},
-  "financial_exposure": {{
-    "minimum": "Lower estimate",
-    "maximum": "Upper estimate",
-    "legal_costs": "Estimated litigation costs"
-  }},
-  "timeline_risk": "Risk of delays or prolonged litigation",
-  "risk_explanation": "Detailed 4-5 sentence analysis explaining all risk factors, their interconnections, and overall case exposure. Include specific legal considerations and precedent implications.",
-  "recommendations": [
-    "Immediate action item 1 with specific steps",
-    "Strategic recommendation 2 for risk mitigation",
-    "Long-term consideration 3 for case management"
-  ]
-}}
-
-Provide thorough, professional analysis."""
-        
-        answer = call_ollama(risk_prompt, expect_json=True)
-        
-        if isinstance(answer, dict):
-            return {"risk_analysis": answer}
-        
-        parsed = extract_json_from_response(str(answer)) if answer else None
-        if parsed:
-            return {"risk_analysis": parsed}
-        
-        return {"risk_analysis": get_enhanced_fallback()["risk"]}
+        return {"risk_analysis": await run_risk(case_details, evidence)}
         
+    except SchedulerBusy:
+        raise
     except Exception as e:
         print(f"[ERROR] calculate_risk: {e}")
         return {"risk_analysis": get_enhanced_fallback()["risk"]}
@@ -443,118 +861,10 @@ async def calculate_case_strength(request: Request):
         
         print(f"\n[STRENGTH] Detailed strength analysis...")
         
-        strength_prompt = f"""As a legal strategy consultant, analyze case strength comprehensively:
-
-CASE INFORMATION:
-Type: {case_info.get('case_type', 'Unknown')}
-Sections: {', '.join(case_info.get('sections', []))}
-Key Facts: {len(case_info.get('key_facts', []))} facts documented
-Evidence: {len(evidence_list)} items available
-
-Provide detailed JSON analysis:
-{{
-  "strength_score": 68,
-  "confidence_level": "High/Medium/Low",
-  "win_probability": 65,
-  "settlement_probability": 75,
-  "strengths": [
-    {{
-      "aspect": "Strong documentary evidence",
-      "description": "Written agreements and correspondence establish clear contractual relationship",
-      "legal_weight": "High",
-      "supports": "Primary claim of breach of contract"
-    }},
-    {{
-      "aspect": "Clear timeline of events",
-      "description": "Well-documented sequence showing performance and default",
-      "legal_weight": "Medium-High",
-      "supports": "Cause of action and damages calculation"
-    }},
-    {{
-      "aspect": "Applicable precedents",
-      "description": "Established case law supports similar contract disputes",
-      "legal_weight": "Medium",
-      "supports": "Legal interpretation and remedies"
-    }}
-  ],
-  "weaknesses": [
-    {{
-      "aspect": "Incomplete documentation",
-      "description": "Missing key correspondence or payment receipts",
-      "legal_impact": "Medium",
-      "how_to_address": "Request through discovery process"
-    }},
-    {{
-      "aspect": "Potential counterclaims",
-      "description": "Defendant may raise service quality issues",
-      "legal_impact": "Low-Medium",
-      "how_to_address": "Prepare rebuttal evidence"
-    }}
-  ],
-  "critical_evidence": [
-    "Original signed agreement",
-    "Service delivery proof/acceptance",
-    "Payment demand notices",
-    "All correspondence chain"
-  ],
-  "missing_evidence": [
-    {{
-      "item": "Payment receipts for partial payments",
-      "importance": "High",
-      "how_to_obtain": "Bank statements or accounting records"
-    }},
-    {{
-      "item": "Expert testimony on service quality",
-      "importance": "Medium",
-      "how_to_obtain": "Engage technical expert witness"
-    }}
-  ],
-  "legal_arguments": [
-    "Primary: Breach of contract under Indian Contract Act 1872",
-    "Secondary: Quantum meruit for services rendered",
-    "Alternative: Unjust enrichment principles"
-  ],
-  "opponent_arguments": [
-    "Possible defense: Service quality issues",
-    "Possible defense: Force majeure or financial hardship",
-    "Counter-strategy: Documented acceptance and approval required"
-  ],
-  "recommendations": [
-    {{
-      "priority": "High",
-      "action": "Consolidate all documentary evidence",
-      "timeline": "Within 2 weeks",
-      "reason": "Strengthens primary claim"
-    }},
-    {{
-      "priority": "Medium",
-      "action": "Prepare expert witness testimony",
-      "timeline": "Before trial",
-      "reason": "Counters quality objections"
-    }},
-    {{
-      "priority": "High",
-      "action": "Explore settlement negotiation",
-      "timeline": "Pre-trial stage",
-      "reason": "High settlement probability suggests cost-effective resolution"
-    }}
-  ],
-  "case_theory": "Clear 2-3 sentence explanation of the winning legal theory and strategy"
-}}
-
-Provide thorough professional analysis."""
-        
-        answer = call_ollama(strength_prompt, expect_json=True)
-        
-        if isinstance(answer, dict):
-            return {"strength_analysis": answer}
-        
-        parsed = extract_json_from_response(str(answer)) if answer else None
-        if parsed:
-            return {"strength_analysis": parsed}
-        
-        return {"strength_analysis": get_enhanced_fallback()["strength"]}
+        return {"strength_analysis": await run_strength(case_info, evidence_list)}
         
+    except SchedulerBusy:
+        raise
     except Exception as e:
         print(f"[ERROR] case_strength: {e}")
         return {"strength_analysis": get_enhanced_fallback()["strength"]}
@@ -620,6 +930,17 @@ def get_enhanced_fallback():
             ]
         }
     }
+
+
+def parse_flag(value, default=False):
+    """Read a JSON boolean, also accepting "true"/"false" style strings and 0/1"""
+    if value is None:
+        return default
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return value == 1
+
+
 @app.post("/api/find-precedents")
 async def find_precedents(request: Request):
     """Find similar precedents"""
@@ -627,40 +948,19 @@ async def find_precedents(request: Request):
         data = await request.json()
         case_description = data.get("case_description", "")
         case_type = data.get("case_type", "")
+        explain = parse_flag(data.get("explain"), PRECEDENT_EXPLAIN)
+        top_k = min(max(1, int(data.get("top_k", PRECEDENT_TOP_K))), PRECEDENT_MAX_K)
         
         print(f"\n[PRECEDENTS] Finding for {case_type}...")
         
-        precedent_prompt = f"""Find 3 relevant Indian legal precedents for this case:
-
-Case Type: {case_type}
-Description: {case_description}
-
-Return ONLY a JSON array:
-[
-  {{
-    "title": "Party A vs Party B",
-    "citation": "2023 SCC 145",
-    "similarity": 85,
-    "verdict": "Verdict summary",
-    "reasoning": "Brief court reasoning",
-    "relevance": "How it applies to current case",
-    "keyTakeaway": "Main lesson from this precedent"
-  }}
-]"""
-        
-        answer = call_ollama(precedent_prompt, expect_json=True)
-        
-        if isinstance(answer, list):
-            return {"precedents": answer}
-        
-        parsed = extract_json_from_response(str(answer)) if answer else None
-        if parsed and isinstance(parsed, list):
-            return {"precedents": parsed}
-        
-        return {"precedents": get_default_responses()["precedents"]}
+        return {"precedents": await run_precedents(case_description, case_type, explain, top_k)}
         
+    except SchedulerBusy:
+        raise
     except Exception as e:
         print(f"[ERROR] find_precedents: {e}")
+        if precedent_index is not None:
+            return {"precedents": [], "error": "Precedent search failed, please try again"}
         return {"precedents": get_default_responses()["precedents"]}
 
 
@@ -675,77 +975,110 @@ async def generate_timeline(request: Request):
         
         print(f"\n[TIMELINE] Generating for {case_type}...")
         
-        timeline_prompt = f"""Generate realistic Indian court timeline:
-
-Case Type: {case_type}
-Jurisdiction: {jurisdiction}
-Filing Date: {filing_date}
-
-Return ONLY a JSON array with 5-7 stages:
-[
-  {{
-    "stage": "Stage name",
-    "date": "2024-01-15",
-    "status": "Completed or Pending or Upcoming",
-    "description": "Brief description",
-    "expected_duration": "Duration estimate"
-  }}
-]
-
-Include: FIR/Filing, Investigation, Chargesheet, First Hearing, Trial, Arguments, Judgment."""
-        
-        answer = call_ollama(timeline_prompt, expect_json=True)
-        
-        if isinstance(answer, list):
-            return {"timeline": answer}
-        
-        parsed = extract_json_from_response(str(answer)) if answer else None
-        if parsed and isinstance(parsed, list):
-            return {"timeline": parsed}
-        
-        return {"timeline": get_default_responses()["timeline"]}
+        return {"timeline": await run_timeline(case_type, jurisdiction, filing_date)}
         
+    except SchedulerBusy:
+        raise
     except Exception as e:
         print(f"[ERROR] generate_timeline: {e}")
         return {"timeline": get_default_responses()["timeline"]}
 
 
+# Full case pipeline: analysis first, then the four follow-ups in parallel.
+# Section names match the keys returned by the individual endpoints.
+def pipeline_analysis(ctx):
+    analysis = ctx["analysis"]
+    return analysis if isinstance(analysis, dict) else {}
+
+
+CASE_PIPELINE = {
+    "analysis": ((), lambda ctx: run_analysis(ctx["case_text"])),
+    "risk_analysis": (("analysis",), lambda ctx: run_risk(pipeline_analysis(ctx), ctx["evidence"])),
+    "strength_analysis": (("analysis",), lambda ctx: run_strength(pipeline_analysis(ctx), ctx["evidence"])),
+    "precedents": (("analysis",), lambda ctx: run_precedents(
+        " ".join(map(str, pipeline_analysis(ctx).get("key_facts") or [])) or ctx["case_text"][:500],
+        pipeline_analysis(ctx).get("case_type") or "General",
+    )),
+    "timeline": (("analysis",), lambda ctx: run_timeline(
+        pipeline_analysis(ctx).get("case_type") or "Criminal",
+        pipeline_analysis(ctx).get("jurisdiction") or "District Court",
+        ctx["filing_date"],
+    )),
+}
+
+
+@app.post("/api/case-pipeline")
+async def case_pipeline(request: Request):
+    """Run the whole case analysis in one request, streaming each section as SSE"""
+    try:
+        data = await request.json()
+        case_text = data.get("case_text", "")
+    except Exception as e:
+        print(f"[ERROR] case_pipeline: {e}")
+        return JSONResponse({"error": "Request body must be a JSON object"}, status_code=400)
+    if not isinstance(case_text, str):
+        return JSONResponse({"error": "case_text must be a string"}, status_code=400)
+    
+    print(f"\n[PIPELINE] Case text length: {len(case_text)} chars")
+    
+    if not case_text:
+        return JSONResponse({"error": "Case text is required"}, status_code=400)
+    
+    context = {
+        "case_text": case_text,
+        "evidence": data.get("evidence", []),
+        "filing_date": data.get("filing_date") or date.today().isoformat(),
+    }
+    
+    model_scheduler.check_capacity()
+    
+    async def events():
+        async for name, result, error in run_stages(CASE_PIPELINE, context):
+            if error is not None:
+                print(f"[ERROR] case_pipeline {name}: {error}")
+                yield sse_event({"section": name, "error": str(error)}, event="error")
+            else:
+                print(f"[PIPELINE] ✅ {name} ready")
+                yield sse_event({name: result}, event=name)
+        yield sse_event({"status": "complete"}, event="done")
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.post("/api/upload-evidence")
-async def upload_evidence(file: UploadFile = File(...)):
+async def upload_evidence(request: Request):
     """Upload and analyze evidence - FULL TEXT"""
     try:
-        print(f"\n[EVIDENCE] Uploading: {file.filename}")
-        
-        content = await file.read()
         extracted_text = ""
+        # Parsed off the request stream into a bounded buffer that spills to disk when large
+        with await receive_upload(request) as upload:
+            filename = upload.filename
+            print(f"\n[EVIDENCE] Uploading: {filename}")
+            if filename.endswith('.pdf'):
+                # Parsed on the PDF worker pool so the event loop stays free;
+                # re-uploads are served from the shared extraction cache
+                pages, page_count = await extract_pdf_pages_cached(upload.source(), key=upload.key)
+                extracted_text = "".join(page + "\n" for page in pages)
+                upload.note_memory(sys.getsizeof(extracted_text))
+                print(f"[EVIDENCE] Extracted {len(extracted_text)} chars from {len(pages)}/{page_count} pages")
+            elif filename.endswith(('.txt', '.doc', '.docx')):
+                extracted_text = upload.decode_text()
+            upload_stats = upload.stats()
+        print(f"[EVIDENCE] {upload_stats['size_bytes']} bytes, peak {upload_stats['peak_memory_bytes']} bytes in memory, "
+              f"spilled to disk: {upload_stats['spilled_to_disk']}")
+        
+        # Analyze FULL evidence text, condensing it first when it is too long for one prompt
+        document = extracted_text
+        if len(extracted_text) > LONG_DOCUMENT_CHARS:
+            _, document = await condense_document(extracted_text)
+        evidence_prompt = build_evidence_prompt(document)
         
-        if file.filename.endswith('.pdf'):
-            pdf_file = io.BytesIO(content)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            for page in pdf_reader.pages:
-                extracted_text += page.extract_text() + "\n"
-            print(f"[EVIDENCE] Extracted {len(extracted_text)} chars")
-        elif file.filename.endswith(('.txt', '.doc', '.docx')):
-            extracted_text = content.decode('utf-8', errors='ignore')
-        
-        # Analyze FULL evidence text
-        evidence_prompt = f"""Analyze this complete evidence document:
-
-FULL DOCUMENT:
-{extracted_text}
-
-Return ONLY valid JSON:
-{{
-  "document_type": "FIR or Complaint or Agreement or Statement or Report",
-  "weight": 85,
-  "impact": "Critical or High or Medium or Low",
-  "key_points": ["Point 1", "Point 2", "Point 3"],
-  "strengthens_case": true,
-  "summary": "2-3 sentence summary"
-}}"""
-        
-        answer = call_ollama(evidence_prompt, expect_json=True)
-        analysis = answer if isinstance(answer, dict) else extract_json_from_response(str(answer))
+        answer = await call_ollama(evidence_prompt, expect_json=True, profile="evidence")
+        analysis = answer if isinstance(answer, dict) else None
         
         if not analysis:
             analysis = {
@@ -759,11 +1092,14 @@ Return ONLY valid JSON:
         
         return {
             "success": True,
-            "filename": file.filename,
+            "filename": filename,
             "extracted_text": extracted_text[:500],
-            "analysis": analysis
+            "analysis": analysis,
+            "upload": upload_stats
         }
         
+    except (SchedulerBusy, UploadTooLarge, InvalidUpload):
+        raise
     except Exception as e:
         print(f"[ERROR] upload_evidence: {e}")
         return JSONResponse({"error": str(e)}, status_code=500)
@@ -779,15 +1115,60 @@ async def root():
     }
 
 
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Hit/miss counters for the LLM response cache, request coalescing and extracted documents"""
+    return {
+        **response_cache.stats(),
+        "single_flight": ollama_flights.stats(),
+        "extraction": get_extraction_cache().stats(),
+    }
+
+
+@app.get("/api/scheduler/stats")
+async def scheduler_stats():
+    """Queue depth, wait times and rejections for the model scheduler"""
+    return model_scheduler.stats()
+
+
+@app.get("/api/retrieval/stats")
+async def retrieval_stats():
+    """Passage count and average embed/search time for chat retrieval"""
+    if retriever is None:
+        return {"enabled": False}
+    return {"enabled": True, **retriever.stats()}
+
+
+@app.get("/api/precedents/stats")
+async def precedents_stats():
+    """Case count and average search time for the precedent index"""
+    if precedent_index is None:
+        return {"enabled": False}
+    return {"enabled": True, **precedent_index.stats()}
+
+
+@app.get("/api/sections/stats")
+async def sections_stats():
+    """Size of the section lookup index"""
+    return section_index.stats()
+
+
+@app.get("/api/sessions/stats")
+async def session_stats():
+    """Size and eviction counters for the chat session store"""
+    return await session_call(conversations.stats)
+
+
 @app.get("/health")
 async def health_check():
     """Check Ollama status"""
     try:
-        response = requests.get(f"{OLLAMA_URL}/api/tags", timeout=5)
-        if response.status_code == 200:
-            models = response.json().get("models", [])
-            return {"status": "healthy", "ollama": "connected", "models": [m["name"] for m in models]}
-        return {"status": "unhealthy", "ollama": "error"}
+        session = get_ollama_session()
+        async with session.get(f"{OLLAMA_URL}/api/tags", timeout=aiohttp.ClientTimeout(total=5)) as response:
+            if response.status == 200:
+                models = (await response.json(content_type=None)).get("models", [])
+                return {"status": "healthy", "ollama": "connected", "models": [m["name"] for m in models]}
+            return {"status": "unhealthy", "ollama": "error"}
     except:
         return {"status": "unhealthy", "ollama": "not_running"}
 
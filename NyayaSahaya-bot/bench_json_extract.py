@@ -0,0 +1,156 @@
+"""Fuzz and benchmark json_extract against the old regex cascade.
+
+Run with ``python bench_json_extract.py``. Every sample below is a shape we
+have seen Mistral return for the analysis prompts. The script checks the
+extractor result for each sample, throws randomly mutated outputs at it to
+make sure it never raises, and times it against the regex patterns it
+replaced on normal and pathological inputs.
+"""
+import json
+import random
+import re
+import time
+
+from json_extract import StreamingJSONExtractor, extract_json_from_response
+
+ANALYSIS = {
+    "case_type": "Criminal",
+    "sections": ["BNS Section 318 (Cheating)", "BNS Section 61 (Criminal conspiracy)"],
+    "parties": {"petitioner": "State of Delhi", "respondent": "R. Kumar"},
+    "key_facts": ["FIR No. 112/2024 registered at PS Saket", "Amount of Rs. 4,50,000 transferred {via UPI}"],
+}
+TIMELINE = [
+    {"stage": "FIR", "date": "2024-01-15", "status": "Completed"},
+    {"stage": "Chargesheet", "date": "2024-04-10", "status": "Pending"},
+]
+
+# (description, model output, expected value or None)
+SAMPLES = [
+    ("bare object", json.dumps(ANALYSIS), ANALYSIS),
+    ("bare array", json.dumps(TIMELINE), TIMELINE),
+    ("json fence", f"Here is the analysis:\n```json\n{json.dumps(ANALYSIS, indent=2)}\n```\nLet me know.", ANALYSIS),
+    ("plain fence", f"```\n{json.dumps(TIMELINE)}\n```", TIMELINE),
+    ("prose around array", f"Sure! The timeline is {json.dumps(TIMELINE)} as requested.", TIMELINE),
+    ("trailing whitespace", json.dumps(ANALYSIS) + "\n" * 2000 + " " * 2000, ANALYSIS),
+    ("braces in strings", json.dumps({"summary": "Clause {3} and [annex] apply", "ok": True}), {"summary": "Clause {3} and [annex] apply", "ok": True}),
+    ("escaped quotes", json.dumps({"quote": 'He said "pay {now}"'}), {"quote": 'He said "pay {now}"'}),
+    ("prose brace first", "Note {this is not json}. " + json.dumps(ANALYSIS), ANALYSIS),
+    ("trailing comma object", '{"case_type": "Civil", "sections": ["A",],}', None),
+    ("truncated object", json.dumps(ANALYSIS)[:-40], None),
+    ("single quotes", str(ANALYSIS), None),
+    ("valid inner object", '{"analysis": {"case_type": "Civil"}, "broken": [1, 2,]}', {"case_type": "Civil"}),
+    ("mismatched brackets", '{"a": [1, 2}' + json.dumps(TIMELINE), TIMELINE),
+    ("empty", "", None),
+    ("no json", "I could not analyse this document.", None),
+]
+
+# Recovered from inside a broken value, which only the one-shot extractor does
+NESTED_ONLY = {"valid inner object"}
+
+# Inputs that make the old lazy DOTALL patterns backtrack
+PATHOLOGICAL = [
+    ("unclosed brace + quotes", '{"a" ' + '"x": ' * 400),
+    ("many opening brackets", "[{" * 1000),
+    ("deep nesting", "[" * 5000 + "]" * 5000),
+    ("brace soup", '{"k": "v" ' * 1000),
+    ("long prose", "The accused stated that " * 2000 + "{"),
+]
+
+LEGACY_PATTERNS = [
+    r'```json\s*(\{.*?\}|\[.*?\])\s*```',
+    r'```\s*(\{.*?\}|\[.*?\])\s*```',
+    r'(\{[^{}]*"[^"]*"[^{}]*:.*?\})',
+    r'(\[[^\[\]]*\{.*?\}[^\[\]]*\])'
+]
+
+
+def legacy_extract(text):
+    text = str(text).strip()
+    try:
+        return json.loads(text)
+    except Exception:
+        pass
+    for pattern in LEGACY_PATTERNS:
+        match = re.search(pattern, text, re.DOTALL)
+        if match:
+            try:
+                return json.loads(match.group(1))
+            except Exception:
+                continue
+    return None
+
+
+def timed(fn, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def mutate(text, rng):
+    chars = list(text)
+    for _ in range(rng.randint(1, 8)):
+        op = rng.random()
+        position = rng.randrange(len(chars) + 1)
+        if op < 0.4 and chars:
+            del chars[min(position, len(chars) - 1)]
+        elif op < 0.8:
+            chars.insert(position, rng.choice('{}[]",:\\ \n`'))
+        else:
+            chars = chars[:position]
+    return "".join(chars)
+
+
+def check_samples():
+    failures = 0
+    for description, text, expected in SAMPLES:
+        result = extract_json_from_response(text)
+        status = "ok" if result == expected else "FAIL"
+        failures += status == "FAIL"
+        print(f"  {status:4} {description}")
+
+        # Streaming must agree with the one-shot extractor on whole values
+        extractor = StreamingJSONExtractor()
+        for i in range(0, len(text), 7):
+            if extractor.feed(text[i:i + 7]) is not None:
+                break
+        streamed = None if description in NESTED_ONLY else expected
+        if extractor.value != streamed:
+            failures += 1
+            print(f"  FAIL {description} (streaming)")
+    return failures
+
+
+def fuzz(iterations=5000, seed=7):
+    rng = random.Random(seed)
+    bases = [text for _, text, _ in SAMPLES if text]
+    slowest = 0.0
+    for _ in range(iterations):
+        text = mutate(rng.choice(bases), rng)
+        start = time.perf_counter()
+        result = extract_json_from_response(text)
+        slowest = max(slowest, time.perf_counter() - start)
+        assert result is None or isinstance(result, (dict, list))
+    return slowest * 1000
+
+
+def main():
+    print("Samples:")
+    failures = check_samples()
+
+    slowest = fuzz()
+    print(f"\nFuzz: 5000 mutated outputs, no exceptions, slowest {slowest:.2f} ms")
+
+    print("\nTiming (ms per call):")
+    print(f"  {'input':28} {'chars':>8} {'scanner':>10} {'regex':>10}")
+    for description, text, _ in SAMPLES[:6]:
+        print(f"  {description:28} {len(text):8} {timed(extract_json_from_response, text, 200):10.3f} {timed(legacy_extract, text, 200):10.3f}")
+    for description, text in PATHOLOGICAL:
+        print(f"  {description:28} {len(text):8} {timed(extract_json_from_response, text, 3):10.3f} {timed(legacy_extract, text, 1):10.3f}")
+
+    if failures:
+        raise SystemExit(f"\n{failures} sample(s) failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Compare FAISS index types on build time, size, load time, query latency and recall.
+
+Run with ``python bench_vector_index.py`` after ``Ingest.py`` to benchmark the
+vectors in ipc_embed_db, or with ``--synthetic 200000`` to try a corpus size
+we do not have yet. Each index type from vector_index.py is built from the
+same vectors and searched one query at a time, as /api/chat does. Recall@k is
+measured against exact results from a flat index, and IVF and HNSW rows are
+repeated for every ``--nprobe`` / ``--ef-search`` value. Quantized types are
+also run with exact re-ranking for every ``--rerank`` factor, as the app does
+when ``vectors.npy`` is present. ``size MB`` is what a worker holds in memory
+(the codes) and ``load ms`` is the time to read the index from disk.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+import vector_index
+
+
+def load_vectors(index_dir):
+    """The float32 copy Ingest.py saves for quantized indexes, else the vectors rebuilt from the index"""
+    path = os.path.join(index_dir, vector_index.VECTORS_FILE)
+    if os.path.exists(path):
+        return np.load(path)
+    index = faiss.read_index(os.path.join(index_dir, "index.faiss"))
+    if hasattr(index, "make_direct_map"):
+        faiss.extract_index_ivf(index).make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def synthetic_vectors(count, dim, seed=0):
+    """Clustered vectors, closer to real embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, count // 100), dim)).astype("float32")
+    labels = rng.integers(len(centers), size=count)
+    return centers[labels] + 0.3 * rng.normal(size=(count, dim)).astype("float32")
+
+
+def make_queries(vectors, count, seed=1):
+    """Perturbed copies of stored vectors, like a question phrased near a section"""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(vectors), min(count, len(vectors)), replace=False)
+    noise = rng.normal(scale=vectors.std() * 0.1, size=(len(rows), vectors.shape[1]))
+    return (vectors[rows] + noise).astype("float32")
+
+
+def search_latencies(index, queries, k):
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(ids[0])
+    return np.array(latencies), np.array(results)
+
+
+def load_time_ms(index):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "index.faiss")
+        faiss.write_index(index, path)
+        start = time.perf_counter()
+        faiss.read_index(path)
+        return (time.perf_counter() - start) * 1000
+
+
+def recall_at_k(found, exact):
+    hits = sum(len(set(row) & set(truth)) for row, truth in zip(found, exact))
+    return hits / exact.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index-dir", default=os.getenv("INGEST_OUTPUT_DIR", "ipc_embed_db"))
+    parser.add_argument("--synthetic", type=int, default=0, help="benchmark N random clustered vectors instead")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--types", default=",".join(vector_index.INDEX_TYPES))
+    parser.add_argument("--nprobe", default=f"4,{vector_index.VECTOR_INDEX_NPROBE},64")
+    parser.add_argument("--ef-search", default=f"32,{vector_index.VECTOR_INDEX_EF_SEARCH},256")
+    parser.add_argument("--rerank", default=f"{vector_index.VECTOR_INDEX_RERANK},16",
+                        help="re-rank factors tried on quantized types")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = synthetic_vectors(args.synthetic, args.dim)
+    else:
+        vectors = load_vectors(args.index_dir)
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    queries = make_queries(vectors, args.queries)
+    print(f"{len(vectors)} vectors of dim {vectors.shape[1]}, {len(queries)} queries, k={args.k}, "
+          f"float32 vectors {vectors.nbytes / (1024 * 1024):.1f} MB\n")
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    print(f"{'index':12} {'param':>14} {'rerank':>6} {'build s':>9} {'size MB':>9} {'load ms':>8} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'recall':>7}")
+    for kind in args.types.split(","):
+        start = time.perf_counter()
+        index = vector_index.build_index(vectors, kind)
+        index.add(vectors)
+        build_seconds = time.perf_counter() - start
+        size_mb = faiss.serialize_index(index).nbytes / (1024 * 1024)
+        load_ms = load_time_ms(index)
+        factors = [0]
+        if vector_index.is_quantized(kind):
+            factors += [int(value) for value in args.rerank.split(",")]
+
+        if hasattr(index, "nprobe"):
+            settings = [("nprobe", int(value)) for value in args.nprobe.split(",")]
+        elif hasattr(index, "hnsw"):
+            settings = [("efSearch", int(value)) for value in args.ef_search.split(",")]
+        else:
+            settings = [("", None)]
+
+        for name, value in settings:
+            if name == "nprobe":
+                vector_index.tune(index, nprobe=value)
+            elif name == "efSearch":
+                vector_index.tune(index, ef_search=value)
+            param = f"{name}={value}" if name else "-"
+            for factor in factors:
+                searched = vector_index.RerankedIndex(index, vectors, factor) if factor else index
+                latencies, found = search_latencies(searched, queries, args.k)
+                print(
+                    f"{kind:12} {param:>14} {factor or '-':>6} {build_seconds:9.2f} {size_mb:9.1f} "
+                    f"{load_ms:8.1f} {np.percentile(latencies, 50):8.3f} {np.percentile(latencies, 99):8.3f} "
+                    f"{recall_at_k(found, truth):7.3f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Okapi BM25 over the ingested chunks, with array-backed postings.
+
+Built by Ingest.py over the same chunks as the FAISS index, in FAISS position
+order, and saved as ``bm25.npz`` next to it. Postings are stored CSR-style:
+for term ``t`` the documents are ``doc_ids[offsets[t]:offsets[t + 1]]`` with
+term frequencies in ``tfs``, so the whole index is four flat arrays and a
+vocabulary, which is saved as one newline-separated UTF-8 blob rather than a
+fixed-width string array as wide as its longest term. Scoring visits rare terms first and stops adding terms once the
+latency budget is spent; common terms contribute the least to BM25 anyway.
+"""
+import collections
+import re
+import time
+from array import array
+
+import numpy as np
+
+BM25_FILE = "bm25.npz"
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or that the this to was were which "
+    "with shall any such whoever who may".split()
+)
+
+
+def tokenize(text):
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Lexical index over ``doc_count`` documents numbered 0..doc_count-1"""
+
+    def __init__(self, vocabulary, offsets, doc_ids, tfs, doc_lengths, k1=1.2, b=0.75):
+        self.vocabulary = vocabulary
+        self.term_ids = {term: i for i, term in enumerate(vocabulary)}
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.doc_count = len(doc_lengths)
+        self.avg_length = float(doc_lengths.mean()) if self.doc_count else 0.0
+        # Per-document length normalisation, computed once
+        self.norms = (k1 * (1 - b + b * doc_lengths / max(self.avg_length, 1e-9))).astype("float32")
+
+    @classmethod
+    def build(cls, texts):
+        """Build from an iterable of texts, streaming postings into flat arrays.
+
+        Postings are appended as 10 bytes each rather than kept as per-term
+        Python lists, then grouped by term with one stable sort, so building
+        needs a small multiple of the finished index and never the corpus.
+        """
+        term_ids = {}
+        terms, docs, tfs, doc_lengths = array("I"), array("I"), array("H"), array("I")
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            for token, count in collections.Counter(tokens).items():
+                terms.append(term_ids.setdefault(token, len(term_ids)))
+                docs.append(doc_id)
+                tfs.append(min(count, 65535))
+
+        vocabulary = sorted(term_ids)
+        rank = np.empty(len(vocabulary), dtype="uint32")
+        rank[[term_ids[term] for term in vocabulary]] = np.arange(len(vocabulary), dtype="uint32")
+        terms = rank[np.frombuffer(terms, dtype="uint32")]
+        # Documents were added in order, so a stable sort keeps each posting list sorted by doc id
+        order = np.argsort(terms, kind="stable")
+        offsets = np.zeros(len(vocabulary) + 1, dtype="uint32")
+        offsets[1:] = np.cumsum(np.bincount(terms, minlength=len(vocabulary)))
+        del terms
+        return cls(
+            vocabulary, offsets,
+            np.frombuffer(docs, dtype="uint32")[order], np.frombuffer(tfs, dtype="uint16")[order],
+            np.frombuffer(doc_lengths, dtype="uint32").copy(),
+        )
+
+    def save(self, path):
+        np.savez(
+            path,
+            vocabulary=np.frombuffer("\n".join(self.vocabulary).encode("utf-8"), dtype="uint8"),
+            offsets=self.offsets,
+            doc_ids=self.doc_ids,
+            tfs=self.tfs,
+            doc_lengths=self.doc_lengths,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            vocabulary = data["vocabulary"]
+            if vocabulary.dtype.kind == "U":
+                # Written before the vocabulary was stored as a blob
+                vocabulary = vocabulary.tolist()
+            else:
+                vocabulary = vocabulary.tobytes().decode("utf-8").split("\n") if len(vocabulary) else []
+            return cls(vocabulary, data["offsets"], data["doc_ids"], data["tfs"], data["doc_lengths"])
+
+    def search(self, query, k=20, budget_ms=None):
+        """Return ``(doc_ids, scores)`` of the top ``k`` documents, best first"""
+        started = time.perf_counter()
+        terms = []
+        for token in set(tokenize(query)):
+            term_id = self.term_ids.get(token)
+            if term_id is not None:
+                terms.append((int(self.offsets[term_id + 1] - self.offsets[term_id]), term_id))
+        if not terms or not self.doc_count:
+            return np.empty(0, dtype="int64"), np.empty(0, dtype="float32")
+
+        scores = np.zeros(self.doc_count, dtype="float32")
+        for position, (frequency, term_id) in enumerate(sorted(terms)):
+            if position and budget_ms is not None and (time.perf_counter() - started) * 1000 > budget_ms:
+                break
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.tfs[start:end].astype("float32")
+            idf = np.log(1 + (self.doc_count - frequency + 0.5) / (frequency + 0.5))
+            # Each document appears once per term, so plain fancy-index add is safe
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + self.norms[docs])
+
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return np.empty(0, dtype="int64"), np.empty(0, dtype="float32")
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top]
+
+    def stats(self):
+        return {
+            "documents": self.doc_count,
+            "terms": len(self.vocabulary),
+            "postings": len(self.doc_ids),
+            "bytes": int(self.offsets.nbytes + self.doc_ids.nbytes + self.tfs.nbytes + self.doc_lengths.nbytes),
+        }
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse ranked lists of document ids; returns ``[(doc_id, score)]`` best first"""
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,98 @@
+"""Near-duplicate detection for ingest chunks with MinHash and LSH banding.
+
+Each chunk is reduced to the set of its word shingles and then to a MinHash
+signature of DEDUP_NUM_PERM values, whose agreement rate estimates the
+Jaccard similarity of two chunks. Signatures are split into bands; chunks
+sharing any band are candidates, and a candidate is a duplicate when its
+estimated similarity reaches the threshold. Only signatures and band keys
+are kept, never the chunk text.
+"""
+import re
+import zlib
+
+import numpy as np
+
+DEDUP_NUM_PERM = 128
+SHINGLE_WORDS = 5
+
+TOKEN = re.compile(r"\w+")
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+def shingles(text, size=SHINGLE_WORDS):
+    """CRC32 hashes of the overlapping ``size``-word runs in ``text``"""
+    words = TOKEN.findall(text.lower())
+    if len(words) <= size:
+        return np.array([zlib.crc32(" ".join(words).encode("utf-8"))], dtype="uint64")
+    return np.fromiter(
+        (zlib.crc32(" ".join(words[i:i + size]).encode("utf-8")) for i in range(len(words) - size + 1)),
+        dtype="uint64",
+    )
+
+
+def lsh_bands(threshold, num_perm=DEDUP_NUM_PERM):
+    """``(bands, rows)`` whose S-curve midpoint is the closest one at or below ``threshold``.
+
+    Erring low means more candidates to verify rather than missed duplicates.
+    """
+    options = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    below = [(b, r) for b, r in options if (1 / b) ** (1 / r) <= threshold]
+    return max(below, key=lambda option: (1 / option[0]) ** (1 / option[1])) if below else options[0]
+
+
+class NearDuplicateIndex:
+    """Chunks seen so far, queried for ones with estimated Jaccard similarity >= ``threshold``"""
+
+    def __init__(self, threshold, num_perm=DEDUP_NUM_PERM, seed=1):
+        rng = np.random.default_rng(seed)
+        # Below 2**31 so a * x + b never overflows uint64 for 32-bit x
+        self.a = rng.integers(1, 1 << 31, size=num_perm, dtype="uint64")
+        self.b = rng.integers(0, 1 << 31, size=num_perm, dtype="uint64")
+        self.threshold = threshold
+        self.bands, self.rows = lsh_bands(threshold, num_perm)
+        self.buckets = [{} for _ in range(self.bands)]
+        self.signatures = []
+        self.checked = 0
+        self.dropped = 0
+
+    def signature(self, text):
+        hashes = shingles(text)[:, None]
+        return (((self.a * hashes + self.b) % MERSENNE_PRIME) & MAX_HASH).min(axis=0).astype("uint32")
+
+    def band_keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def insert(self, text):
+        """Remember ``text`` without checking it, e.g. for chunks already in the index"""
+        self._insert(self.signature(text))
+
+    def _insert(self, signature, keys=None):
+        position = len(self.signatures)
+        self.signatures.append(signature)
+        for bucket, key in zip(self.buckets, keys or self.band_keys(signature)):
+            bucket.setdefault(key, []).append(position)
+
+    def add(self, text):
+        """Remember ``text`` and return True, or return False when it is a near-duplicate"""
+        self.checked += 1
+        signature = self.signature(text)
+        keys = self.band_keys(signature)
+        candidates = set()
+        for bucket, key in zip(self.buckets, keys):
+            candidates.update(bucket.get(key, ()))
+        for position in candidates:
+            if np.mean(self.signatures[position] == signature) >= self.threshold:
+                self.dropped += 1
+                return False
+        self._insert(signature, keys)
+        return True
+
+    def stats(self):
+        return {
+            "checked": self.checked,
+            "dropped": self.dropped,
+            "indexed": len(self.signatures),
+            "bands": self.bands,
+            "rows": self.rows,
+        }
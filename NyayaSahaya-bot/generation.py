@@ -0,0 +1,50 @@
+import os
+
+# Per-endpoint generation settings. num_predict is the output budget the
+# prompt's JSON schema actually needs, not a blanket maximum.
+GENERATION_PROFILES = {
+    "chat": {"temperature": 0.7, "num_predict": 1024},
+    "analysis": {"temperature": 0.3, "num_predict": 2048},
+    "risk": {"temperature": 0.3, "num_predict": 1536},
+    "strength": {"temperature": 0.3, "num_predict": 2048},
+    "precedents": {"temperature": 0.3, "num_predict": 1024},
+    "precedent_notes": {"temperature": 0.3, "num_predict": 512},
+    "timeline": {"temperature": 0.3, "num_predict": 768},
+    "evidence": {"temperature": 0.3, "num_predict": 768},
+    "chunk_facts": {"temperature": 0.3, "num_predict": 768},
+}
+
+# Fixed context sizes so Ollama can reuse a loaded model instead of
+# reallocating the KV cache for every distinct prompt length
+CONTEXT_BUCKETS = (2048, 4096, 8192, 16384, 32768)
+MAX_CONTEXT = int(os.getenv("OLLAMA_MAX_CTX", "16384"))
+
+# Conservative for English legal text; Mistral's tokenizer averages ~4 chars/token
+CHARS_PER_TOKEN = 3.2
+
+
+def estimate_tokens(messages):
+    chars = sum(len(message["content"]) for message in messages)
+    # A few tokens of chat-template overhead per message
+    return int(chars / CHARS_PER_TOKEN) + 8 * len(messages)
+
+
+def context_size(prompt_tokens, num_predict):
+    """Smallest bucket holding the prompt plus the output budget, capped at MAX_CONTEXT"""
+    needed = prompt_tokens + num_predict
+    for bucket in CONTEXT_BUCKETS:
+        if bucket >= needed:
+            return min(bucket, MAX_CONTEXT)
+    return MAX_CONTEXT
+
+
+def generation_options(messages, profile):
+    settings = GENERATION_PROFILES[profile]
+    num_ctx = context_size(estimate_tokens(messages), settings["num_predict"])
+    return {
+        "temperature": settings["temperature"],
+        "num_predict": settings["num_predict"],
+        "num_ctx": num_ctx,
+        "top_p": 0.9,
+        "repeat_penalty": 1.1,
+    }
@@ -0,0 +1,149 @@
+import json
+
+_decoder = json.JSONDecoder()
+
+OPENERS = {"{": "}", "[": "]"}
+CLOSERS = {"}", "]"}
+
+# How many levels to descend into a balanced span that fails to decode.
+# Keeps the worst case linear-ish on deeply nested garbage.
+MAX_RESCAN_DEPTH = 2
+
+
+class JSONScanner:
+    """Single-pass scanner for balanced top-level ``{...}`` / ``[...]`` spans.
+
+    Tracks nesting with a stack and skips brackets inside JSON strings, so
+    each character is inspected once. State survives between :meth:`feed`
+    calls, which lets a streamed response be scanned as it arrives.
+    """
+
+    def __init__(self):
+        self.buffer = []
+        self.length = 0
+        self.stack = []
+        self.start = None
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text):
+        """Consume more text and return the ``(start, end)`` spans it completed"""
+        spans = []
+        offset = self.length
+        self.buffer.append(text)
+        self.length += len(text)
+
+        for i, char in enumerate(text):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+
+            if char in OPENERS:
+                if not self.stack:
+                    self.start = offset + i
+                self.stack.append(OPENERS[char])
+            elif not self.stack:
+                continue
+            elif char == '"':
+                self.in_string = True
+            elif char in CLOSERS:
+                if char != self.stack.pop():
+                    # Mismatched bracket: drop this candidate and keep scanning
+                    self.stack.clear()
+                    self.start = None
+                elif not self.stack:
+                    spans.append((self.start, offset + i + 1))
+                    self.start = None
+        return spans
+
+    def text(self):
+        if len(self.buffer) > 1:
+            self.buffer = ["".join(self.buffer)]
+        return self.buffer[0] if self.buffer else ""
+
+
+def decode_whole(text, start, end):
+    """Decode text[start:end] as one JSON value, or return None"""
+    try:
+        value, stop = _decoder.raw_decode(text, start)
+        if stop == end:
+            return value
+    except (ValueError, RecursionError):
+        pass
+    return None
+
+
+def decode_span(text, start, end, depth=0):
+    """Decode text[start:end]; if that fails, try the spans nested one level inside"""
+    value = decode_whole(text, start, end)
+    if value is not None:
+        return value
+
+    if depth >= MAX_RESCAN_DEPTH:
+        return None
+    inner = JSONScanner()
+    for inner_start, inner_end in inner.feed(text[start + 1:end - 1]):
+        value = decode_span(text, start + 1 + inner_start, start + 1 + inner_end, depth + 1)
+        if isinstance(value, (dict, list)):
+            return value
+    return None
+
+
+def extract_json_from_response(text):
+    """Return the first JSON object or array in ``text``, or None.
+
+    Handles bare JSON, markdown code fences and JSON surrounded by prose in
+    one linear scan followed by ``raw_decode`` on the candidate spans.
+    """
+    if isinstance(text, (dict, list)):
+        return text
+    if text is None:
+        return None
+
+    text = str(text).strip()
+
+    try:
+        value = json.loads(text)
+        if isinstance(value, (dict, list)):
+            return value
+    except (ValueError, RecursionError):
+        pass
+
+    scanner = JSONScanner()
+    for start, end in scanner.feed(text):
+        value = decode_span(text, start, end)
+        if isinstance(value, (dict, list)):
+            return value
+    return None
+
+
+class StreamingJSONExtractor:
+    """Find the first complete JSON value in a stream of text chunks.
+
+    :meth:`feed` returns the parsed value as soon as a top-level object or
+    array closes, so the caller can stop reading the rest of the generation.
+    Unlike :func:`extract_json_from_response` it never descends into a value
+    that fails to decode: a fragment of a broken answer is not the answer.
+    """
+
+    def __init__(self):
+        self.scanner = JSONScanner()
+        self.value = None
+
+    def feed(self, chunk):
+        if self.value is not None:
+            return self.value
+        for start, end in self.scanner.feed(chunk):
+            value = decode_whole(self.scanner.text(), start, end)
+            if isinstance(value, (dict, list)):
+                self.value = value
+                break
+        return self.value
+
+    def text(self):
+        return self.scanner.text()
@@ -0,0 +1,155 @@
+import re
+
+# Lines that open a new logical unit in judgments, chargesheets and statutes
+SECTION_BREAK = re.compile(
+    r"^\s*(?:section\s+\d+|sec\.\s*\d+|chapter\s+[\divxlc]+|part\s+[\divxlc]+|"
+    r"article\s+\d+|schedule\b|\d+\.\s+[A-Z]|\(\d+\)\s|[IVXLC]+\.\s)",
+    re.IGNORECASE,
+)
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_BREAK = re.compile(r"(?<=[.;:?!])\s+")
+
+FACT_FIELDS = ("facts", "parties", "sections", "dates", "issues")
+
+
+def split_blocks(text):
+    """Split text on blank lines, then again before any section-style heading"""
+    blocks = []
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        current = []
+        for line in paragraph.splitlines():
+            if current and SECTION_BREAK.match(line):
+                blocks.append("\n".join(current))
+                current = []
+            current.append(line)
+        if current:
+            blocks.append("\n".join(current))
+    return [block.strip() for block in blocks if block.strip()]
+
+
+def split_oversized(block, max_chars):
+    """Break a single block that is longer than a chunk on sentence boundaries"""
+    pieces, current = [], ""
+    for sentence in SENTENCE_BREAK.split(block):
+        while len(sentence) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_document(text, max_chars=6000):
+    """Pack section/paragraph blocks greedily into chunks of at most max_chars"""
+    chunks, current, size = [], [], 0
+    for block in split_blocks(text):
+        parts = [block] if len(block) <= max_chars else split_oversized(block, max_chars)
+        for part in parts:
+            if current and size + len(part) + 2 > max_chars:
+                chunks.append("\n\n".join(current))
+                current, size = [], 0
+            current.append(part)
+            size += len(part) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def merge_chunk_facts(results):
+    """Union the per-chunk extractions, keeping first-seen order and dropping repeats"""
+    merged = {field: [] for field in FACT_FIELDS}
+    seen = {field: set() for field in FACT_FIELDS}
+    for result in results:
+        if not isinstance(result, dict):
+            continue
+        for field in FACT_FIELDS:
+            values = result.get(field) or []
+            if isinstance(values, str):
+                values = [values]
+            for value in values:
+                value = str(value).strip()
+                key = " ".join(value.lower().split())
+                if value and key not in seen[field]:
+                    seen[field].add(key)
+                    merged[field].append(value)
+    return merged
+
+
+def plan_chunks(text, chunk_chars=6000, max_chunks=16, max_chunk_chars=24000):
+    """Split text into at most max_chunks chunks so the number of map calls is bounded.
+
+    Chunks grow from chunk_chars up to max_chunk_chars until the document fits
+    in max_chunks of them. A document too long even for that is sampled: the
+    chunks kept are spread evenly from its first to its last. Returns
+    ``(chunks, total)`` where total is the number of chunks before sampling.
+    """
+    size = max(chunk_chars, -(-len(text) // max_chunks))
+    while True:
+        size = min(size, max_chunk_chars)
+        chunks = split_document(text, size)
+        if len(chunks) <= max_chunks or size >= max_chunk_chars:
+            break
+        size = int(size * 1.25) + 1
+    total = len(chunks)
+    if total > max_chunks:
+        if max_chunks == 1:
+            return chunks[:1], total
+        step = (total - 1) / (max_chunks - 1)
+        chunks = [chunks[round(i * step)] for i in range(max_chunks)]
+    return chunks, total
+
+
+DIGEST_TITLES = {
+    "facts": "KEY FACTS",
+    "parties": "PARTIES",
+    "sections": "SECTIONS CITED",
+    "dates": "IMPORTANT DATES",
+    "issues": "LEGAL ISSUES",
+}
+# Share of the digest each field may use; space a field does not need goes to the others
+DIGEST_WEIGHTS = {"facts": 4, "issues": 2, "parties": 1, "sections": 1, "dates": 1}
+
+
+def format_digest(merged, max_chars=8000):
+    """Render merged facts as a compact document that fits in one prompt.
+
+    Every field gets its own share of max_chars, so a long list of parties or
+    dates cannot crowd the facts out of the digest.
+    """
+    blocks = {}
+    for field in FACT_FIELDS:
+        if merged.get(field):
+            blocks[field] = [f"{DIGEST_TITLES[field]}:"] + [f"- {value}" for value in merged[field]]
+
+    def size(lines):
+        return sum(len(line) + 1 for line in lines) + 1
+
+    # Fill the smallest fields first so what they leave over is shared by the rest
+    budget = max_chars
+    allowance = {}
+    pending = sorted(blocks, key=lambda field: size(blocks[field]))
+    while pending:
+        field = pending.pop(0)
+        share = budget * DIGEST_WEIGHTS[field] // (DIGEST_WEIGHTS[field] + sum(DIGEST_WEIGHTS[f] for f in pending))
+        allowance[field] = min(size(blocks[field]), share)
+        budget -= allowance[field]
+
+    parts = []
+    for field in blocks:
+        kept, used = [], 1
+        for line in blocks[field]:
+            if used + len(line) + 1 > allowance[field]:
+                break
+            kept.append(line)
+            used += len(line) + 1
+        if len(kept) > 1:
+            parts.append("\n".join(kept))
+    return "\n\n".join(parts)
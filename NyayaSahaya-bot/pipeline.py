@@ -0,0 +1,38 @@
+import asyncio
+
+
+async def run_stages(stages, context):
+    """Run a small dependency graph of async stages, yielding results as they finish.
+
+    ``stages`` maps a stage name to ``(dependencies, fn)`` where ``fn`` is an
+    async callable taking ``context``. Each stage starts as soon as all of its
+    dependencies are done, and its result is stored in ``context[name]`` for
+    the stages after it. Yields ``(name, result, error)`` in completion order;
+    a failed stage also fails everything that depends on it.
+    """
+    tasks = {}
+
+    async def run_stage(name):
+        dependencies, fn = stages[name]
+        for dependency in dependencies:
+            await tasks[dependency]
+        context[name] = await fn(context)
+        return context[name]
+
+    async def labelled(name):
+        try:
+            return name, await tasks[name], None
+        except Exception as e:
+            return name, None, e
+
+    for name in stages:
+        tasks[name] = asyncio.ensure_future(run_stage(name))
+    pending = [asyncio.ensure_future(labelled(name)) for name in stages]
+
+    try:
+        for next_done in asyncio.as_completed(pending):
+            yield await next_done
+    finally:
+        for task in list(tasks.values()) + pending:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,159 @@
+"""Similar-case search over an ingested corpus of judgments.
+
+The corpus is a directory of judgment texts or summaries, one case per file,
+indexed by Ingest.py into ``precedent_db`` (see its docstring). Each file may
+start with ``Title:``, ``Citation:``, ``Verdict:`` ... header lines, which
+Ingest.py keeps as chunk metadata. A search embeds the case description,
+takes the nearest chunks from FAISS and keeps the best chunk per case, so a
+long judgment matched by several chunks still counts once.
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+from retrieval import faiss, query_embedder, read_documents, read_index
+
+PRECEDENT_INDEX_DIR = os.getenv(
+    "PRECEDENT_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "precedent_db")
+)
+PRECEDENT_TOP_K = int(os.getenv("PRECEDENT_TOP_K", "3"))
+# Upper bound on a request's "top_k"; every hit can end up in the explain prompt
+PRECEDENT_MAX_K = int(os.getenv("PRECEDENT_MAX_K", "10"))
+# Chunks fetched per requested case, so cases matched by several chunks still fill top-k
+PRECEDENT_CHUNKS_PER_CASE = int(os.getenv("PRECEDENT_CHUNKS_PER_CASE", "8"))
+# Ask the LLM to write relevance/keyTakeaway for the hits unless the request says otherwise
+PRECEDENT_EXPLAIN = os.getenv("PRECEDENT_EXPLAIN", "0") == "1"
+EXCERPT_CHARS = 400
+
+
+def excerpt(text, limit=EXCERPT_CHARS):
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0] + "…"
+
+
+def similarity(distance, normalized):
+    """Squared L2 distance as a 0-1 score; cosine similarity for unit vectors"""
+    if normalized:
+        return max(0.0, 1.0 - distance / 2)
+    return 1.0 / (1.0 + distance)
+
+
+class PrecedentIndex:
+    """Nearest cases to a description, from chunk embeddings grouped by source file"""
+
+    def __init__(self, index, cases, chunk_cases, chunks, embed_query, normalized=True):
+        self.index = index
+        self.cases = cases
+        self.chunk_cases = chunk_cases
+        self.chunks = chunks
+        self.embed_query = embed_query
+        self.normalized = normalized
+        self.searches = 0
+        self.search_ms = 0.0
+
+    @classmethod
+    def from_documents(cls, index, documents, embed_query, normalized=True):
+        """Group chunk ``documents`` (in FAISS position order) into cases by source file"""
+        cases, case_ids, chunk_cases = [], {}, np.empty(len(documents), dtype="int32")
+        for position, document in enumerate(documents):
+            source = os.path.basename(document.metadata.get("source", ""))
+            if source not in case_ids:
+                case_ids[source] = len(cases)
+                cases.append({**document.metadata, "source": source})
+            chunk_cases[position] = case_ids[source]
+        chunks = [document.page_content for document in documents]
+        return cls(index, cases, chunk_cases, chunks, embed_query, normalized)
+
+    def __len__(self):
+        return len(self.cases)
+
+    def search(self, description, k=PRECEDENT_TOP_K):
+        """Return up to ``k`` cases as ``(case, score, best_chunk)``, best first"""
+        started = time.perf_counter()
+        vector = np.asarray([self.embed_query(description)], dtype="float32")
+        if self.normalized:
+            vector /= max(float(np.linalg.norm(vector)), 1e-12)
+        depth = min(k * PRECEDENT_CHUNKS_PER_CASE, self.index.ntotal)
+        distances, positions = self.index.search(vector, depth)
+
+        best = {}
+        for distance, position in zip(distances[0], positions[0]):
+            if position < 0:
+                continue
+            case_id = int(self.chunk_cases[position])
+            # Results come nearest first, so the first chunk seen per case is its best
+            if case_id not in best:
+                best[case_id] = (similarity(float(distance), self.normalized), int(position))
+                if len(best) == k:
+                    break
+
+        self.searches += 1
+        self.search_ms += (time.perf_counter() - started) * 1000
+        return [
+            (self.cases[case_id], score, self.chunks[position])
+            for case_id, (score, position) in best.items()
+        ]
+
+    def stats(self):
+        return {
+            "cases": len(self.cases),
+            "chunks": len(self.chunk_cases),
+            "normalized": self.normalized,
+            "searches": self.searches,
+            "avg_search_ms": round(self.search_ms / max(self.searches, 1), 2),
+        }
+
+
+def format_precedent(case, score, chunk):
+    """A hit in the shape /api/find-precedents has always returned"""
+    return {
+        "title": case.get("title") or os.path.splitext(case["source"])[0].replace("_", " "),
+        "citation": case.get("citation", ""),
+        "court": case.get("court", ""),
+        "date": case.get("date", ""),
+        "similarity": round(score * 100),
+        "verdict": case.get("verdict", ""),
+        "reasoning": case.get("reasoning", ""),
+        "relevance": excerpt(chunk),
+        "keyTakeaway": case.get("key_takeaway", ""),
+        "source": case["source"],
+    }
+
+
+def read_normalized(index_dir):
+    """Whether Ingest.py stored unit-length vectors, from its manifest"""
+    try:
+        with open(os.path.join(index_dir, "manifest.json"), "r", encoding="utf-8") as f:
+            return bool(json.load(f)["settings"].get("normalize"))
+    except (OSError, ValueError, KeyError):
+        return False
+
+
+def load_precedents(index_dir=PRECEDENT_INDEX_DIR):
+    """Load the precedent index, or return None to fall back to generated precedents"""
+    if PRECEDENT_TOP_K < 1:
+        return None
+    index_path = os.path.join(index_dir, "index.faiss")
+    if faiss is None or not os.path.exists(index_path):
+        print(f"[PRECEDENTS] ⚠️ No precedent index at {index_dir}, precedents will be generated by the LLM")
+        return None
+    try:
+        embed_query = query_embedder()
+    except ImportError:
+        print("[PRECEDENTS] ⚠️ langchain-community is not installed, precedents will be generated by the LLM")
+        return None
+    from vector_index import tune, with_rerank
+
+    index, _ = read_index(index_path)
+    tune(index)
+    index = with_rerank(index, index_dir)
+    normalized = read_normalized(index_dir)
+    if not normalized:
+        print("[PRECEDENTS] ⚠️ Index was built without INGEST_NORMALIZE=1, similarity is approximate")
+    precedents = PrecedentIndex.from_documents(index, read_documents(index_dir, index.ntotal), embed_query, normalized)
+    print(f"[PRECEDENTS] ✅ Loaded {len(precedents)} cases ({index.ntotal} chunks) from {index_dir}")
+    return precedents
@@ -0,0 +1,302 @@
+def build_analysis_prompt(case_text):
+    return f"""You are a senior legal analyst. Perform a comprehensive analysis of this legal document.
+
+FULL LEGAL DOCUMENT:
+{case_text}
+
+Provide detailed analysis in this JSON format:
+{{
+    "case_type": "Criminal/Civil/Property/Family/Constitutional/Consumer",
+    "sub_category": "Specific type like Contract Dispute, Cheating, Property Transfer",
+    "jurisdiction": "Specify exact court - District Court/High Court/Supreme Court and state",
+    "court_location": "City or district name",
+    "sections": ["List ALL applicable sections with full names - e.g., IPC Section 420, Contract Act 1872 Section 73"],
+    "complexity_score": 75,
+    "urgency_level": "Critical/High/Medium/Low",
+    "estimated_duration": "Estimated time to resolution",
+    "parties": {{
+        "petitioner": "Full name and designation",
+        "petitioner_type": "Individual/Company/Government",
+        "respondent": "Full name and designation",
+        "respondent_type": "Individual/Company/Government",
+        "other_parties": ["List any other involved parties"]
+    }},
+    "case_summary": "Comprehensive 3-4 sentence summary of the entire case",
+    "key_facts": [
+        "Detailed fact 1 with dates and specifics",
+        "Detailed fact 2 with amounts and parties",
+        "Detailed fact 3 with legal implications",
+        "Include 5-7 comprehensive facts"
+    ],
+    "legal_issues": [
+        "Primary legal issue with statutory reference",
+        "Secondary legal issue with case law implications",
+        "Constitutional or procedural issues if any"
+    ],
+    "claimed_amount": "Amount in dispute if applicable",
+    "cause_of_action": "When and how the legal cause arose",
+    "jurisdiction_basis": "Why this court has jurisdiction",
+    "previous_proceedings": "Any prior legal action mentioned",
+    "statute_of_limitations": "Time limitation concerns if any",
+    "key_dates": {{
+        "incident_date": "Date of main incident",
+        "filing_date": "When case was filed",
+        "first_hearing": "Scheduled or expected date"
+    }}
+}}
+
+Be thorough and extract every relevant detail from the document."""
+
+
+def build_risk_prompt(case_details, evidence):
+    return f"""As a legal risk analyst, provide detailed risk assessment:
+
+CASE DETAILS:
+Case Type: {case_details.get('case_type', 'Unknown')}
+Sub-Category: {case_details.get('sub_category', 'Not specified')}
+Legal Sections: {', '.join(case_details.get('sections', []))}
+Facts: {'; '.join(case_details.get('key_facts', [])[:3])}
+Parties: {case_details.get('parties', {}).get('petitioner', 'Unknown')} vs {case_details.get('parties', {}).get('respondent', 'Unknown')}
+Evidence Count: {len(evidence)}
+
+Provide comprehensive risk analysis in JSON:
+{{
+  "overall_risk": "Critical/High/Medium/Low",
+  "risk_score": 75,
+  "legal_penalty_probability": 65,
+  "financial_risk": 70,
+  "reputational_risk": 60,
+  "urgency_level": 85,
+  "risk_factors": [
+    {{
+      "factor": "Lack of documented evidence",
+      "severity": "High",
+      "impact": "Could weaken case substantially",
+      "mitigation": "Gather supporting documents immediately"
+    }},
+    {{
+      "factor": "Statute of limitations concern",
+      "severity": "Medium",
+      "impact": "May affect claim validity",
+      "mitigation": "Verify dates and file promptly"
+    }}
+  ],
+  "potential_penalties": {{
+    "criminal": "Details if criminal case",
+    "civil": "Monetary damages, costs, interest",
+    "administrative": "Any regulatory penalties"
+  }},
+  "financial_exposure": {{
+    "minimum": "Lower estimate",
+    "maximum": "Upper estimate",
+    "legal_costs": "Estimated litigation costs"
+  }},
+  "timeline_risk": "Risk of delays or prolonged litigation",
+  "risk_explanation": "Detailed 4-5 sentence analysis explaining all risk factors, their interconnections, and overall case exposure. Include specific legal considerations and precedent implications.",
+  "recommendations": [
+    "Immediate action item 1 with specific steps",
+    "Strategic recommendation 2 for risk mitigation",
+    "Long-term consideration 3 for case management"
+  ]
+}}
+
+Provide thorough, professional analysis."""
+
+
+def build_strength_prompt(case_info, evidence_list):
+    return f"""As a legal strategy consultant, analyze case strength comprehensively:
+
+CASE INFORMATION:
+Type: {case_info.get('case_type', 'Unknown')}
+Sections: {', '.join(case_info.get('sections', []))}
+Key Facts: {len(case_info.get('key_facts', []))} facts documented
+Evidence: {len(evidence_list)} items available
+
+Provide detailed JSON analysis:
+{{
+  "strength_score": 68,
+  "confidence_level": "High/Medium/Low",
+  "win_probability": 65,
+  "settlement_probability": 75,
+  "strengths": [
+    {{
+      "aspect": "Strong documentary evidence",
+      "description": "Written agreements and correspondence establish clear contractual relationship",
+      "legal_weight": "High",
+      "supports": "Primary claim of breach of contract"
+    }},
+    {{
+      "aspect": "Clear timeline of events",
+      "description": "Well-documented sequence showing performance and default",
+      "legal_weight": "Medium-High",
+      "supports": "Cause of action and damages calculation"
+    }},
+    {{
+      "aspect": "Applicable precedents",
+      "description": "Established case law supports similar contract disputes",
+      "legal_weight": "Medium",
+      "supports": "Legal interpretation and remedies"
+    }}
+  ],
+  "weaknesses": [
+    {{
+      "aspect": "Incomplete documentation",
+      "description": "Missing key correspondence or payment receipts",
+      "legal_impact": "Medium",
+      "how_to_address": "Request through discovery process"
+    }},
+    {{
+      "aspect": "Potential counterclaims",
+      "description": "Defendant may raise service quality issues",
+      "legal_impact": "Low-Medium",
+      "how_to_address": "Prepare rebuttal evidence"
+    }}
+  ],
+  "critical_evidence": [
+    "Original signed agreement",
+    "Service delivery proof/acceptance",
+    "Payment demand notices",
+    "All correspondence chain"
+  ],
+  "missing_evidence": [
+    {{
+      "item": "Payment receipts for partial payments",
+      "importance": "High",
+      "how_to_obtain": "Bank statements or accounting records"
+    }},
+    {{
+      "item": "Expert testimony on service quality",
+      "importance": "Medium",
+      "how_to_obtain": "Engage technical expert witness"
+    }}
+  ],
+  "legal_arguments": [
+    "Primary: Breach of contract under Indian Contract Act 1872",
+    "Secondary: Quantum meruit for services rendered",
+    "Alternative: Unjust enrichment principles"
+  ],
+  "opponent_arguments": [
+    "Possible defense: Service quality issues",
+    "Possible defense: Force majeure or financial hardship",
+    "Counter-strategy: Documented acceptance and approval required"
+  ],
+  "recommendations": [
+    {{
+      "priority": "High",
+      "action": "Consolidate all documentary evidence",
+      "timeline": "Within 2 weeks",
+      "reason": "Strengthens primary claim"
+    }},
+    {{
+      "priority": "Medium",
+      "action": "Prepare expert witness testimony",
+      "timeline": "Before trial",
+      "reason": "Counters quality objections"
+    }},
+    {{
+      "priority": "High",
+      "action": "Explore settlement negotiation",
+      "timeline": "Pre-trial stage",
+      "reason": "High settlement probability suggests cost-effective resolution"
+    }}
+  ],
+  "case_theory": "Clear 2-3 sentence explanation of the winning legal theory and strategy"
+}}
+
+Provide thorough professional analysis."""
+
+
+def build_precedent_prompt(case_description, case_type):
+    return f"""Find 3 relevant Indian legal precedents for this case:
+
+Case Type: {case_type}
+Description: {case_description}
+
+Return ONLY a JSON array:
+[
+  {{
+    "title": "Party A vs Party B",
+    "citation": "2023 SCC 145",
+    "similarity": 85,
+    "verdict": "Verdict summary",
+    "reasoning": "Brief court reasoning",
+    "relevance": "How it applies to current case",
+    "keyTakeaway": "Main lesson from this precedent"
+  }}
+]"""
+
+
+def build_precedent_notes_prompt(case_description, precedents):
+    cases = "\n\n".join(
+        f"{i}. {p['title']} {p['citation']}\nVerdict: {p['verdict'] or 'Not stated'}\nExcerpt: {p['relevance']}"
+        for i, p in enumerate(precedents, 1)
+    )
+    return f"""These past cases were found similar to the current case:
+
+Current Case: {case_description}
+
+{cases}
+
+For each case, in the same order, explain briefly how it applies to the current case and the main lesson from it.
+
+Return ONLY a JSON array with {len(precedents)} items:
+[
+  {{
+    "relevance": "How it applies to current case",
+    "keyTakeaway": "Main lesson from this precedent"
+  }}
+]"""
+
+def build_timeline_prompt(case_type, jurisdiction, filing_date):
+    return f"""Generate realistic Indian court timeline:
+
+Case Type: {case_type}
+Jurisdiction: {jurisdiction}
+Filing Date: {filing_date}
+
+Return ONLY a JSON array with 5-7 stages:
+[
+  {{
+    "stage": "Stage name",
+    "date": "2024-01-15",
+    "status": "Completed or Pending or Upcoming",
+    "description": "Brief description",
+    "expected_duration": "Duration estimate"
+  }}
+]
+
+Include: FIR/Filing, Investigation, Chargesheet, First Hearing, Trial, Arguments, Judgment."""
+
+
+def build_evidence_prompt(extracted_text):
+    return f"""Analyze this complete evidence document:
+
+FULL DOCUMENT:
+{extracted_text}
+
+Return ONLY valid JSON:
+{{
+  "document_type": "FIR or Complaint or Agreement or Statement or Report",
+  "weight": 85,
+  "impact": "Critical or High or Medium or Low",
+  "key_points": ["Point 1", "Point 2", "Point 3"],
+  "strengthens_case": true,
+  "summary": "2-3 sentence summary"
+}}"""
+
+
+def build_chunk_facts_prompt(chunk, chunk_number, total_chunks):
+    return f"""You are reading part {chunk_number} of {total_chunks} of a long legal document.
+Extract only what appears in THIS part.
+
+DOCUMENT PART:
+{chunk}
+
+Return ONLY valid JSON:
+{{
+  "facts": ["Concrete fact with names, amounts and dates"],
+  "parties": ["Name and role of every person or organisation mentioned"],
+  "sections": ["Every statute or section cited, e.g. BNS Section 318, IPC Section 420"],
+  "dates": ["YYYY-MM-DD or as written - what happened on that date"],
+  "issues": ["Legal issue raised in this part"]
+}}"""
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_cache_key(payload):
+    """Hash the parts of an Ollama request that determine its output"""
+    material = json.dumps(
+        {
+            "model": payload.get("model"),
+            "messages": payload.get("messages"),
+            "format": payload.get("format"),
+            "options": payload.get("options"),
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier cache for parsed LLM responses.
+
+    The memory tier is an LRU bounded by ``max_entries``. The optional disk
+    tier stores one JSON file per key under ``disk_dir`` and ignores entries
+    older than ``ttl`` seconds; expired files are swept from ``set`` every
+    ``sweep_interval`` seconds. Values are stored serialized so callers can
+    never mutate a cached result. With a disk tier, calls do file I/O, so
+    async callers should run them in a thread (``blocking``).
+    """
+
+    def __init__(self, max_entries=256, disk_dir=None, ttl=86400, sweep_interval=300):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()  # get/set may run in worker threads
+        self._last_sweep = 0.0
+        self.swept = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @property
+    def blocking(self):
+        return bool(self.disk_dir)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _remember(self, key, raw):
+        with self._lock:
+            self._memory[key] = raw
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            raw = self._memory.get(key)
+            if raw is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+        if raw is not None:
+            return json.loads(raw)
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                if time.time() - os.path.getmtime(path) <= self.ttl:
+                    with open(path, "r", encoding="utf-8") as f:
+                        raw = f.read()
+                    self._remember(key, raw)
+                    self.disk_hits += 1
+                    return json.loads(raw)
+                os.remove(path)
+            except (OSError, ValueError):
+                pass
+
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        raw = json.dumps(value, ensure_ascii=False)
+        self._remember(key, raw)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(raw)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"[CACHE] ⚠️ Could not write {path}: {e}")
+            self._sweep_expired()
+
+    def _sweep_expired(self):
+        """Delete disk entries past the TTL that were never read again"""
+        now = time.time()
+        with self._lock:
+            if now - self._last_sweep < self.sweep_interval:
+                return
+            self._last_sweep = now
+        for entry in os.scandir(self.disk_dir):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                if now - entry.stat().st_mtime > self.ttl:
+                    os.remove(entry.path)
+                    self.swept += 1
+            except OSError:
+                pass
+
+    def clear(self):
+        self._memory.clear()
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.disk_dir, name))
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "disk_enabled": bool(self.disk_dir),
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "disk_swept": self.swept,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+        }
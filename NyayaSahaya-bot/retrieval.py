@@ -0,0 +1,193 @@
+"""Top-k passage retrieval over the ipc_embed_db index built by Ingest.py.
+
+The index is loaded once at startup, memory-mapped when its type allows, and
+the passages are flattened into a list by FAISS position so a lookup is one
+``index.search`` plus list indexing. The query is embedded with the same
+model Ingest.py used.
+
+When Ingest.py saved a BM25 index alongside, vector and lexical candidates
+are fused with reciprocal rank fusion, so passages that contain the exact
+terms of the question ("dowry death", "grievous hurt") rank well even when
+their embeddings do not. Only the fused top-k reach the prompt.
+"""
+import functools
+import os
+import pickle
+import time
+
+import numpy as np
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+from bm25 import BM25_FILE, BM25Index, reciprocal_rank_fusion
+from generation import CHARS_PER_TOKEN
+
+RETRIEVAL_INDEX_DIR = os.getenv(
+    "RETRIEVAL_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "ipc_embed_db")
+)
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "600"))
+# Candidates taken from each ranker before fusion
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "20"))
+# Time the BM25 scorer may spend per query before it stops adding terms
+RETRIEVAL_LEXICAL_BUDGET_MS = float(os.getenv("RETRIEVAL_LEXICAL_BUDGET_MS", "5"))
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "law-ai/InLegalBERT")
+
+
+def read_index(path):
+    """Return ``(index, mmapped)``, reading into memory when the index type cannot be mapped"""
+    try:
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY), True
+    except RuntimeError:
+        return faiss.read_index(path), False
+
+
+def read_documents(index_dir, count):
+    """LangChain ``Document`` for each FAISS position, from index.pkl"""
+    with open(os.path.join(index_dir, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return [docstore.search(index_to_docstore_id[position]) for position in range(count)]
+
+
+def read_passages(index_dir, count):
+    """Passage text and source file for each FAISS position"""
+    passages = []
+    for document in read_documents(index_dir, count):
+        source = os.path.basename(document.metadata.get("source", ""))
+        passages.append((document.page_content, source))
+    return passages
+
+
+def format_context(hits, token_budget=RETRIEVAL_TOKEN_BUDGET):
+    """Join passages best-first until the token budget is spent.
+
+    The first passage is cut to fit rather than dropped, so a tight budget
+    still grounds the answer.
+    """
+    budget = int(token_budget * CHARS_PER_TOKEN)
+    parts = []
+    for hit in hits:
+        text = hit["text"].strip()
+        if len(text) > budget:
+            if parts:
+                break
+            text = text[:budget].rsplit(" ", 1)[0]
+        parts.append(text)
+        budget -= len(text)
+    return "\n---\n".join(parts)
+
+
+class Retriever:
+    """Nearest-neighbour search over embedded passages"""
+
+    def __init__(self, index, passages, embed_query, mmapped=False, lexical=None):
+        self.index = index
+        self.passages = passages
+        self.embed_query = embed_query
+        self.mmapped = mmapped
+        self.lexical = lexical
+        self.searches = 0
+        self.embed_ms = 0.0
+        self.search_ms = 0.0
+        self.lexical_ms = 0.0
+
+    def search(self, query, k=RETRIEVAL_TOP_K, candidates=RETRIEVAL_CANDIDATES):
+        """Return up to ``k`` hits as ``{"text", "source", "score"}``, best first.
+
+        ``score`` is the fused rank score, or the negated L2 distance when
+        there is no lexical index.
+        """
+        started = time.perf_counter()
+        vector = np.asarray([self.embed_query(query)], dtype="float32")
+        embedded = time.perf_counter()
+        depth = max(k, candidates) if self.lexical else k
+        distances, positions = self.index.search(vector, depth)
+        searched = time.perf_counter()
+        # -1 pads the result when there are fewer vectors or too few probed cells
+        ranked = [(int(p), -float(d)) for d, p in zip(distances[0], positions[0]) if p >= 0]
+
+        if self.lexical is not None:
+            lexical_ids, _ = self.lexical.search(query, depth, RETRIEVAL_LEXICAL_BUDGET_MS)
+            ranked = reciprocal_rank_fusion([[p for p, _ in ranked], lexical_ids.tolist()])
+            self.lexical_ms += (time.perf_counter() - searched) * 1000
+
+        self.searches += 1
+        self.embed_ms += (embedded - started) * 1000
+        self.search_ms += (searched - embedded) * 1000
+
+        hits = []
+        for position, score in ranked[:k]:
+            text, source = self.passages[position]
+            hits.append({"text": text, "source": source, "score": score})
+        return hits
+
+    def context(self, query, k=RETRIEVAL_TOP_K, token_budget=RETRIEVAL_TOKEN_BUDGET):
+        """Top-k passages for ``query`` as one prompt-ready string, plus the hits"""
+        hits = self.search(query, k)
+        return format_context(hits, token_budget), hits
+
+    def stats(self):
+        searches = max(self.searches, 1)
+        return {
+            "passages": len(self.passages),
+            "mmapped": self.mmapped,
+            # Candidates per result re-ranked at full precision (quantized indexes)
+            "rerank": getattr(self.index, "factor", 0),
+            "searches": self.searches,
+            "avg_embed_ms": round(self.embed_ms / searches, 2),
+            "avg_search_ms": round(self.search_ms / searches, 3),
+            "hybrid": self.lexical is not None,
+            "avg_lexical_ms": round(self.lexical_ms / searches, 3),
+        }
+
+
+@functools.lru_cache(maxsize=None)
+def query_embedder(model_name=EMBEDDING_MODEL):
+    """``embed_query`` of the embedding model, loaded once and shared by every index"""
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(model_name=model_name).embed_query
+
+
+def load_retriever(index_dir=RETRIEVAL_INDEX_DIR):
+    """Load the index and embedding model, or return None when retrieval is unavailable"""
+    if RETRIEVAL_TOP_K < 1:
+        return None
+    if faiss is None:
+        print("[RETRIEVAL] ⚠️ faiss is not installed, chat runs without retrieval")
+        return None
+    index_path = os.path.join(index_dir, "index.faiss")
+    if not os.path.exists(index_path):
+        print(f"[RETRIEVAL] ⚠️ No index at {index_dir}, run Ingest.py to enable retrieval")
+        return None
+
+    try:
+        embed_query = query_embedder()
+    except ImportError:
+        print("[RETRIEVAL] ⚠️ langchain-community is not installed, chat runs without retrieval")
+        return None
+    from vector_index import tune, with_rerank
+
+    index, mmapped = read_index(index_path)
+    tune(index)
+    index = with_rerank(index, index_dir)
+    passages = read_passages(index_dir, index.ntotal)
+    lexical = load_lexical(index_dir, index.ntotal)
+    print(f"[RETRIEVAL] ✅ Loaded {len(passages)} passages from {index_dir} "
+          f"(mmap: {mmapped}, hybrid: {lexical is not None})")
+    return Retriever(index, passages, embed_query, mmapped, lexical)
+
+
+def load_lexical(index_dir, count):
+    """The BM25 index saved by Ingest.py, if it matches the vector index"""
+    path = os.path.join(index_dir, BM25_FILE)
+    if not os.path.exists(path):
+        return None
+    lexical = BM25Index.load(path)
+    if lexical.doc_count != count:
+        print(f"[RETRIEVAL] ⚠️ {BM25_FILE} covers {lexical.doc_count} chunks, index has {count}; re-run Ingest.py")
+        return None
+    return lexical
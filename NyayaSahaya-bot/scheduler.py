@@ -0,0 +1,122 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+# Lower numbers are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BULK: "bulk"}
+
+
+class SchedulerBusy(Exception):
+    """Raised when the wait queue is full; carries a Retry-After hint in seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Model server is busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class ModelScheduler:
+    """Admission control in front of the model server.
+
+    At most ``max_concurrency`` calls run at once. Further callers wait in a
+    priority queue (lowest priority value first, FIFO within a class) of at
+    most ``max_queue`` entries; once it is full new callers are rejected with
+    :class:`SchedulerBusy` instead of piling up behind the timeout.
+    """
+
+    def __init__(self, max_concurrency=4, max_queue=64, history=500):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._active = 0
+        self._waiters = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        self._waits = deque(maxlen=history)
+        self._service_time = None  # moving average of slot hold time
+        self.admitted = 0
+        self.rejected = 0
+
+    def retry_after(self):
+        service_time = self._service_time or 30.0
+        backlog = len(self._waiters) + self._active
+        return max(1, round(service_time * backlog / self.max_concurrency))
+
+    def check_capacity(self):
+        """Fail fast when a new caller would be rejected"""
+        if self._active >= self.max_concurrency and len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise SchedulerBusy(self.retry_after())
+
+    async def acquire(self, priority=PRIORITY_BULK):
+        start = time.monotonic()
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+        else:
+            if len(self._waiters) >= self.max_queue:
+                self.rejected += 1
+                raise SchedulerBusy(self.retry_after())
+            future = asyncio.get_running_loop().create_future()
+            entry = (priority, next(self._seq), future)
+            heapq.heappush(self._waiters, entry)
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # The slot was handed over just before cancellation
+                    self.release()
+                elif entry in self._waiters:
+                    # release() may already have popped and skipped it in the same tick
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                raise
+        self.admitted += 1
+        self._waits.append(time.monotonic() - start)
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # Hand the slot straight to the next waiter
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority=PRIORITY_BULK):
+        await self.acquire(priority)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            held = time.monotonic() - start
+            if self._service_time is None:
+                self._service_time = held
+            else:
+                self._service_time = 0.8 * self._service_time + 0.2 * held
+            self.release()
+
+    def stats(self):
+        waits = sorted(self._waits)
+        queued = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, _ in self._waiters:
+            name = PRIORITY_NAMES.get(priority, str(priority))
+            queued[name] = queued.get(name, 0) + 1
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self._active,
+            "queue_depth": len(self._waiters),
+            "queued_by_priority": queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "wait_seconds": {
+                "avg": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                "p95": round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0.0,
+                "max": round(waits[-1], 3) if waits else 0.0,
+            },
+            "avg_service_seconds": round(self._service_time or 0.0, 3),
+        }
@@ -0,0 +1,234 @@
+"""Section-number lookup over the BNS handbook in data/ipc_law.txt.
+
+The handbook's section table lists every BNS section with its text and the
+IPC section(s) it replaces, and Annexure-II lists IPC sections that were
+dropped. Both are parsed once into one string of section texts addressed by
+offset arrays, a BNS-by-IPC map and a dict of deleted IPC sections, so a
+lookup is a couple of array reads and a slice.
+"""
+import os
+import re
+from array import array
+
+SECTION_SOURCE = os.getenv(
+    "SECTION_SOURCE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "ipc_law.txt")
+)
+
+# Handbook layout
+TABLE_START = "Legal Provisions of BNS"
+TABLE_END = "ANNEXURE-I"
+DELETED_START = "ANNEXURE-II"
+DELETED_END = "ANNEXURE-III"
+SECTION_START = re.compile(r"^Sec\.\s?(\d{1,3})\b(?!\s*(?:in|to|of)\b)\s*(.*)$")
+DELETED_ROW = re.compile(r"^(?:Sec\.\s?)?(\d{1,3}(?:\s?[A-Z]{1,2})?)\s+([A-Z“].*)$")
+PAGE_FURNITURE = re.compile(
+    r"^(?:BNS Handbook Delhi Police Academy|\d+ Bharatiya Nyaya Sanhita 2023|"
+    r"Bharatiya Nyaya Sanhita 2023 \d+|Sec\. in|BNS Title and Chapters in BNS Sec\. in|IPC)$"
+)
+SUBSECTION_MARKER = re.compile(r"^[\d()&\s]*(?:to)?[\d()&\s]*$")
+# IPC letter suffixes are written 304B, 304-B, 304 A or 376 AB; a letter that
+# starts a word or a following "S." (as in "S.35-S.38") is not a suffix
+IPC_SUFFIX = r"(?:[ \t]?-?[ \t]?[A-Z]{1,2}(?![\w.]))?"
+IPC_RANGE = re.compile(
+    r"\bS\.\s?(\d{1,3})" + IPC_SUFFIX + r"\s*(?:-|to)\s*(?:S\.\s?)?(\d{1,3})" + IPC_SUFFIX + r"(?!\d)"
+)
+IPC_REF = re.compile(r"\bS\.\s?(\d{1,3}(?!\d)" + IPC_SUFFIX + r")(?![\w.])")
+TRAILING_IPC = re.compile(r"\s*S\.\s?\d{1,3}(?!\d)" + IPC_SUFFIX + r".*$")
+
+# Questions that name a section, e.g. "section 318 BNS", "u/s 420 IPC", "IPC 302"
+# A letter suffix follows the digits directly (376AB), after a hyphen (304-B) or,
+# in capitals, after a space (376 AB), so "318 of" is not "318OF"; IPC suffixes
+# run A to J, which keeps "302 OF IPC" and "420 IPC" whole. Longer numbers such
+# as years ("BNS 2023") are not sections
+SECTION_NUMBER = r"\d{1,3}(?!\d)(?:[a-z]{1,2}|-\s?[a-j]{1,2}|\s(?-i:[A-J]{1,2}))?(?![a-z])"
+QUESTION_REF = re.compile(
+    r"\b(?:(?P<code1>bns|ipc)\s*)?(?:section|sec\.?|s\.|u/s)\s*(?P<number>" + SECTION_NUMBER + r")"
+    r"(?:\s*\(\d+\))?(?:\s*(?:of\s+(?:the\s+)?)?(?P<code2>bns|ipc|indian penal code|bharatiya nyaya sanhita))?"
+    r"|\b(?P<code3>bns|ipc)\s*(?P<number2>" + SECTION_NUMBER + r")",
+    re.IGNORECASE,
+)
+# Other statutes; a question naming one without saying BNS or IPC is not about the handbook
+OTHER_ACT = re.compile(
+    r"\b(?:cr\.?\s?p\.?\s?c|c\.?\s?p\.?\s?c|bnss|bsa|act|constitution|article|pocso|ndps|"
+    r"code of (?:criminal|civil) procedure)\b",
+    re.IGNORECASE,
+)
+SOURCE_NOTE = "_Source: BNS Handbook, Delhi Police Academy"
+
+# Words that may surround a reference in a question that is only a lookup
+LOOKUP_WORDS = {
+    "what", "whats", "is", "are", "the", "a", "an", "of", "under", "in", "for", "about", "me",
+    "tell", "explain", "define", "definition", "meaning", "punishment", "punishable", "text",
+    "section", "sec", "bns", "ipc", "new", "old", "corresponding", "equivalent", "which", "does",
+    "say", "says", "please", "show", "offence", "provision", "to", "replaced", "by", "now",
+}
+
+
+def clean_lines(lines):
+    return [line.strip() for line in lines if line.strip() and not PAGE_FURNITURE.match(line.strip())]
+
+
+def normalise_section(number):
+    """Section number in index form, so "304-B" and "376 ab" read as 304B and 376AB"""
+    return re.sub(r"[\s-]", "", number).upper()
+
+
+def ipc_sections(text):
+    """IPC section numbers referenced in a span, with short ranges expanded"""
+    found = []
+    for start, end in IPC_RANGE.findall(text):
+        start, end = int(start), int(end)
+        if 0 < end - start <= 60:
+            found.extend(str(number) for number in range(start, end + 1))
+    found.extend(normalise_section(ref) for ref in IPC_REF.findall(text))
+    return list(dict.fromkeys(found))
+
+
+class SectionIndex:
+    """BNS section texts and IPC correspondences, parsed from the handbook"""
+
+    def __init__(self, text="", starts=None, ends=None, titles=None, by_ipc=None, deleted=None):
+        self.text = text
+        self.starts = starts if starts is not None else array("I")
+        self.ends = ends if ends is not None else array("I")
+        self.titles = titles or {}
+        self.by_ipc = by_ipc or {}
+        self.deleted = deleted or {}
+
+    @classmethod
+    def from_handbook(cls, raw):
+        lines = raw.splitlines()
+        try:
+            table_start = next(i for i, line in enumerate(lines) if line.strip() == TABLE_START)
+            table_end = next(i for i in range(table_start, len(lines)) if lines[i].strip() == TABLE_END)
+        except StopIteration:
+            return cls()
+
+        # Group table lines under the section that precedes them; repeated
+        # headers (Sec.103 (1), Sec.103 (2)) continue the same section
+        sections = {}
+        current = None
+        for line in clean_lines(lines[table_start + 1:table_end]):
+            match = SECTION_START.match(line)
+            if match and (current is None or int(match.group(1)) >= current):
+                current = int(match.group(1))
+                sections.setdefault(current, [])
+                line = match.group(2)
+                if not line:
+                    continue
+            if current is not None:
+                sections[current].append(line)
+
+        parts = []
+        size = max(sections, default=0) + 1
+        starts, ends = array("I", [0] * size), array("I", [0] * size)
+        titles, by_ipc = {}, {}
+        offset = 0
+        for number in sorted(sections):
+            span = "\n".join(sections[number])
+            parts.append(span)
+            starts[number], ends[number] = offset, offset + len(span)
+            offset += len(span) + 1
+            title = next((line for line in sections[number] if not SUBSECTION_MARKER.match(line)), "")
+            titles[number] = TRAILING_IPC.sub("", title)
+            for ipc in ipc_sections(span):
+                by_ipc.setdefault(ipc, []).append(number)
+
+        deleted = {}
+        try:
+            deleted_start = next(i for i in range(table_end, len(lines)) if lines[i].strip() == DELETED_START)
+            deleted_end = next(i for i in range(deleted_start, len(lines)) if lines[i].strip() == DELETED_END)
+        except StopIteration:
+            deleted_start = deleted_end = 0
+        for line in clean_lines(lines[deleted_start + 1:deleted_end]):
+            match = DELETED_ROW.match(line)
+            if match:
+                deleted[match.group(1).replace(" ", "")] = match.group(2)
+
+        return cls(
+            "\n".join(parts), starts, ends, titles,
+            {ipc: tuple(numbers) for ipc, numbers in by_ipc.items()}, deleted,
+        )
+
+    @classmethod
+    def load(cls, path=SECTION_SOURCE):
+        try:
+            with open(path, "r", encoding="utf-8-sig") as f:
+                return cls.from_handbook(f.read())
+        except OSError as e:
+            print(f"[SECTIONS] ⚠️ Could not read {path}: {e}")
+            return cls()
+
+    def __len__(self):
+        return len(self.titles)
+
+    def section(self, number):
+        """Handbook text of BNS section ``number``, or None"""
+        if number >= len(self.starts) or self.starts[number] == self.ends[number]:
+            return None
+        return self.text[self.starts[number]:self.ends[number]]
+
+    def lookup(self, number, code="bns"):
+        """Resolve a section reference to ``[(bns_number, title, text)]``.
+
+        IPC references map to every BNS section that lists them; an IPC
+        section dropped from the BNS returns an empty list.
+        """
+        if code == "ipc":
+            numbers = self.by_ipc.get(number, ())
+        else:
+            numbers = (int(number),) if number.isdigit() else ()
+        return [(n, self.titles.get(n, ""), self.section(n)) for n in numbers if self.section(n)]
+
+    def describe(self, number, code="bns"):
+        """Chat-ready text for a section reference, or None when the handbook has nothing on it"""
+        if code == "ipc" and number in self.deleted and number not in self.by_ipc:
+            return (
+                f"IPC Section {number} ({self.deleted[number]}) was deleted and has no "
+                f"equivalent in the BNS, 2023.\n\n{SOURCE_NOTE}, Annexure-II_"
+            )
+        matches = self.lookup(number, code)
+        return format_sections(matches, number, code) if matches else None
+
+    def stats(self):
+        return {
+            "sections": len(self),
+            "ipc_sections_mapped": len(self.by_ipc),
+            "ipc_sections_deleted": len(self.deleted),
+            "text_chars": len(self.text),
+        }
+
+
+def parse_reference(question):
+    """Find a section reference in a chat question.
+
+    Returns ``(number, code, lookup_only)``: ``code`` is ``"bns"`` unless the
+    question says IPC, and ``lookup_only`` is True when the question names the
+    code and asks for nothing beyond the section itself. Returns None when no
+    section is named, or when the code is not named and the question mentions
+    another statute ("section 125 crpc").
+    """
+    match = QUESTION_REF.search(question)
+    if not match:
+        return None
+    number = normalise_section(match.group("number") or match.group("number2"))
+    named = match.group("code1") or match.group("code2") or match.group("code3")
+    if not named and OTHER_ACT.search(question):
+        return None
+    code = "ipc" if (named or "").lower() in ("ipc", "indian penal code") else "bns"
+
+    rest = question[:match.start()] + " " + question[match.end():]
+    words = re.findall(r"[a-z]+", rest.lower())
+    return number, code, bool(named) and all(word in LOOKUP_WORDS for word in words)
+
+
+def format_sections(matches, number, code):
+    """Render lookup results as a chat answer"""
+    parts = []
+    if code == "ipc":
+        targets = ", ".join(str(bns) for bns, _, _ in matches)
+        parts.append(f"IPC Section {number} corresponds to BNS Section {targets}.")
+    for bns, title, text in matches:
+        parts.append(f"**BNS Section {bns}: {title}**\n\n{text}")
+    parts.append(f"{SOURCE_NOTE}_")
+    return "\n\n".join(parts)
@@ -0,0 +1,197 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+def message_size(message):
+    return len(message["role"]) + len(message["content"].encode("utf-8"))
+
+
+class MemorySessionStore:
+    """Chat history held in process memory with bounded size.
+
+    Each session keeps its last ``max_messages`` messages in a deque, so
+    appending and trimming are O(1). Sessions are kept in LRU order; the least
+    recently used ones are evicted once the total size of stored messages
+    passes ``memory_budget`` bytes, and any session untouched for
+    ``idle_ttl`` seconds is dropped.
+    """
+
+    # Calls are cheap and not thread-safe, so they run on the event loop
+    blocking = False
+
+    def __init__(self, max_messages=6, memory_budget=64 * 1024 * 1024, idle_ttl=6 * 3600):
+        self.max_messages = max_messages
+        self.memory_budget = memory_budget
+        self.idle_ttl = idle_ttl
+        self._sessions = OrderedDict()  # session_id -> (deque, last_seen)
+        self._bytes = 0
+        self.evicted_lru = 0
+        self.evicted_idle = 0
+
+    def _expire_idle(self, now):
+        # Oldest sessions are at the front, so stop at the first live one
+        while self._sessions:
+            session_id, (messages, last_seen) = next(iter(self._sessions.items()))
+            if now - last_seen <= self.idle_ttl:
+                break
+            self._drop(session_id)
+            self.evicted_idle += 1
+
+    def _drop(self, session_id):
+        messages, _ = self._sessions.pop(session_id)
+        self._bytes -= sum(message_size(m) for m in messages)
+
+    def get(self, session_id):
+        now = time.monotonic()
+        self._expire_idle(now)
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return []
+        self._sessions[session_id] = (entry[0], now)
+        self._sessions.move_to_end(session_id)
+        return list(entry[0])
+
+    def append(self, session_id, role, content):
+        now = time.monotonic()
+        self._expire_idle(now)
+        entry = self._sessions.get(session_id)
+        messages = entry[0] if entry else deque(maxlen=self.max_messages)
+        message = {"role": role, "content": content}
+
+        if len(messages) == messages.maxlen:
+            self._bytes -= message_size(messages[0])
+        messages.append(message)
+        self._bytes += message_size(message)
+
+        self._sessions[session_id] = (messages, now)
+        self._sessions.move_to_end(session_id)
+
+        while self._bytes > self.memory_budget and len(self._sessions) > 1:
+            oldest = next(iter(self._sessions))
+            self._drop(oldest)
+            self.evicted_lru += 1
+
+    def clear(self, session_id):
+        if session_id in self._sessions:
+            self._drop(session_id)
+
+    def stats(self):
+        return {
+            "backend": "memory",
+            "sessions": len(self._sessions),
+            "bytes": self._bytes,
+            "memory_budget": self.memory_budget,
+            "idle_ttl_seconds": self.idle_ttl,
+            "evicted_lru": self.evicted_lru,
+            "evicted_idle": self.evicted_idle,
+        }
+
+
+class SQLiteSessionStore:
+    """Chat history in a SQLite file shared by every worker on the host.
+
+    Uses WAL mode so concurrent uvicorn workers can read while one writes.
+    Each append trims the session to its last ``max_messages`` rows, and
+    sessions idle for ``idle_ttl`` seconds are purged periodically.
+    Calls may wait on another worker's write lock, so async code should run
+    them in a thread (``blocking``); each thread gets its own connection.
+    """
+
+    blocking = True
+
+    def __init__(self, path, max_messages=6, idle_ttl=6 * 3600, purge_interval=300):
+        self.path = path
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " session_id TEXT NOT NULL,"
+                " role TEXT NOT NULL,"
+                " content TEXT NOT NULL,"
+                " created REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id)")
+            db.execute("CREATE INDEX IF NOT EXISTS messages_created ON messages (created)")
+
+    def _connect(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _purge_idle(self, db, now):
+        if now - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = now
+        db.execute(
+            "DELETE FROM messages WHERE session_id IN ("
+            " SELECT session_id FROM messages GROUP BY session_id HAVING MAX(created) < ?)",
+            (now - self.idle_ttl,),
+        )
+
+    def get(self, session_id):
+        db = self._connect()
+        rows = db.execute(
+            "SELECT role, content, created FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (session_id, self.max_messages),
+        ).fetchall()
+        if rows and time.time() - rows[0][2] > self.idle_ttl:
+            return []
+        return [{"role": role, "content": content} for role, content, _ in reversed(rows)]
+
+    def append(self, session_id, role, content):
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO messages (session_id, role, content, created) VALUES (?, ?, ?, ?)",
+                (session_id, role, content, now),
+            )
+            db.execute(
+                "DELETE FROM messages WHERE session_id = ? AND id <= ("
+                " SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (session_id, session_id, self.max_messages),
+            )
+            self._purge_idle(db, now)
+
+    def clear(self, session_id):
+        with self._connect() as db:
+            db.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+
+    def stats(self):
+        sessions, messages = self._connect().execute(
+            "SELECT COUNT(DISTINCT session_id), COUNT(*) FROM messages"
+        ).fetchone()
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "sessions": sessions,
+            "messages": messages,
+            "idle_ttl_seconds": self.idle_ttl,
+        }
+
+
+def create_session_store():
+    """Build the session store selected by the SESSION_STORE environment variable"""
+    max_messages = int(os.getenv("SESSION_MAX_MESSAGES", "6"))
+    idle_ttl = float(os.getenv("SESSION_IDLE_TTL", str(6 * 3600)))
+
+    if os.getenv("SESSION_STORE", "memory").lower() == "sqlite":
+        path = os.getenv("SESSION_DB_PATH", "sessions.db")
+        return SQLiteSessionStore(path, max_messages, idle_ttl)
+
+    memory_budget = int(os.getenv("SESSION_MEMORY_BUDGET", str(64 * 1024 * 1024)))
+    return MemorySessionStore(max_messages, memory_budget, idle_ttl)
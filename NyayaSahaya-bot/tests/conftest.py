@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The app's modules live flat in NyayaSahaya-bot/, and the ones shared with
+# pdf_to_text_api.py at the repository root
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+sys.path.insert(1, os.path.dirname(os.path.dirname(TESTS_DIR)))
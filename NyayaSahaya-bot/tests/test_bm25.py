@@ -0,0 +1,24 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from bm25 import BM25Index
+
+
+def test_save_load_round_trip(tmp_path):
+    texts = ["dowry death of a married woman", "causing death by negligence", "theft of movable property"]
+    index = BM25Index.build(texts)
+    index.save(tmp_path / "bm25.npz")
+
+    loaded = BM25Index.load(tmp_path / "bm25.npz")
+
+    assert loaded.vocabulary == index.vocabulary
+    assert loaded.search("death negligence", k=1)[0].tolist() == [1]
+    with np.load(tmp_path / "bm25.npz") as data:
+        # One byte per character plus separators, not a fixed-width string per term
+        assert data["vocabulary"].nbytes == len("\n".join(index.vocabulary))
+
+
+def test_empty_index_round_trip(tmp_path):
+    BM25Index.build([]).save(tmp_path / "bm25.npz")
+    assert BM25Index.load(tmp_path / "bm25.npz").vocabulary == []
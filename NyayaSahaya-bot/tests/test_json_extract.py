@@ -0,0 +1,20 @@
+from json_extract import StreamingJSONExtractor, extract_json_from_response
+
+BROKEN = '{"analysis": {"case_type": "Civil"}, "broken": [1, 2,]}'
+
+
+def stream(text, size=7):
+    extractor = StreamingJSONExtractor()
+    for i in range(0, len(text), size):
+        if extractor.feed(text[i:i + size]) is not None:
+            break
+    return extractor.value
+
+
+def test_streaming_skips_fragments_of_broken_values():
+    assert stream(BROKEN) is None
+    assert extract_json_from_response(BROKEN) == {"case_type": "Civil"}
+
+
+def test_streaming_finds_whole_value_after_broken_one():
+    assert stream(BROKEN + ' then {"case_type": "Criminal"}') == {"case_type": "Criminal"}
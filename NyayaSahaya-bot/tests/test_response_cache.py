@@ -0,0 +1,25 @@
+import os
+import time
+
+from response_cache import ResponseCache
+
+
+def test_set_sweeps_expired_disk_entries(tmp_path):
+    cache = ResponseCache(max_entries=4, disk_dir=str(tmp_path), ttl=60)
+    stale = tmp_path / "old.json"
+    stale.write_text("{}", encoding="utf-8")
+    old = time.time() - 120
+    os.utime(stale, (old, old))
+
+    cache.set("fresh", {"answer": 1})
+
+    assert not stale.exists()
+    assert (tmp_path / "fresh.json").exists()
+    assert cache.stats()["disk_swept"] == 1
+
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    ResponseCache(disk_dir=str(tmp_path)).set("key", {"answer": 1})
+    cache = ResponseCache(disk_dir=str(tmp_path))
+    assert cache.get("key") == {"answer": 1}
+    assert cache.stats()["disk_hits"] == 1
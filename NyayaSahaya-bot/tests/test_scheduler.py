@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from scheduler import ModelScheduler
+
+
+def test_waiter_cancelled_in_same_tick_as_release():
+    async def scenario():
+        scheduler = ModelScheduler(max_concurrency=1)
+        await scheduler.acquire()
+        waiter = asyncio.create_task(scheduler.acquire())
+        await asyncio.sleep(0)
+        # release() pops the cancelled waiter before its except block runs
+        waiter.cancel()
+        scheduler.release()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return scheduler.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["active"] == 0
+    assert stats["queue_depth"] == 0
+
+
+def test_release_hands_slot_to_highest_priority_waiter():
+    async def scenario():
+        scheduler = ModelScheduler(max_concurrency=1)
+        await scheduler.acquire()
+        order = []
+
+        async def waiter(name, priority):
+            await scheduler.acquire(priority)
+            order.append(name)
+            scheduler.release()
+
+        tasks = [asyncio.create_task(waiter("bulk", 10)), asyncio.create_task(waiter("interactive", 0))]
+        await asyncio.sleep(0)
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        return order, scheduler.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["interactive", "bulk"]
+    assert stats["active"] == 0
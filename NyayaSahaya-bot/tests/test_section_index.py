@@ -0,0 +1,71 @@
+import pytest
+
+from section_index import SectionIndex, parse_reference
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("What is section 318 of BNS?", ("318", "bns", True)),
+    ("section 420 of ipc", ("420", "ipc", True)),
+    ("what is section 318 BNS", ("318", "bns", True)),
+    ("u/s 420 IPC", ("420", "ipc", True)),
+    ("IPC 302", ("302", "ipc", True)),
+    ("section 376AB of the bns", ("376AB", "bns", True)),
+    ("Section 103 (1) of the Bharatiya Nyaya Sanhita", ("103", "bns", True)),
+    ("section 376 AB of ipc", ("376AB", "ipc", True)),
+    ("what is section 304-B IPC", ("304B", "ipc", True)),
+    ("section 302 OF IPC", ("302", "ipc", True)),
+    ("Can I get bail under section 318 of BNS for cheating my landlord?", ("318", "bns", False)),
+])
+def test_parse_reference(question, expected):
+    assert parse_reference(question) == expected
+
+
+def test_no_reference():
+    assert parse_reference("What is the punishment for theft?") is None
+
+
+@pytest.mark.parametrize("question", [
+    "section 125 crpc maintenance",
+    "What does section 138 of the NI Act say?",
+    "section 9 cpc jurisdiction",
+    "article 21 of the constitution",
+])
+def test_other_statutes_are_not_bns(question):
+    assert parse_reference(question) is None
+
+
+def test_unnamed_code_is_context_only():
+    assert parse_reference("punishment under section 103") == ("103", "bns", False)
+    assert parse_reference("section 420 ipc and section 9 of the contract act")[:2] == ("420", "ipc")
+
+
+@pytest.mark.parametrize("question", [
+    "what is new in the bns 2023",
+    "What changed in BNS 2023?",
+    "Explain IPC 1860 vs BNS",
+    "section 2023 of the bns",
+])
+def test_years_are_not_sections(question):
+    assert parse_reference(question) is None
+
+
+@pytest.fixture(scope="module")
+def handbook():
+    index = SectionIndex.load()
+    if not len(index):
+        pytest.skip("data/ipc_law.txt not available")
+    return index
+
+
+def test_ipc_letter_suffixes_map_separately(handbook):
+    assert handbook.by_ipc["304"] == (105,)
+    assert handbook.by_ipc["304A"] == (106,)
+    assert handbook.by_ipc["304B"] == (80,)
+    assert handbook.by_ipc["376A"] == (66,)
+    assert handbook.by_ipc["376AB"] == (65,)
+
+
+def test_ipc_ranges_still_expand(handbook):
+    # "S.35-S.38" in the table is a range, not section 35 with suffix S
+    assert "35S" not in handbook.by_ipc
+    assert all(str(number) in handbook.by_ipc for number in range(35, 39))
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+upload_buffer = pytest.importorskip("upload_buffer")
+
+BOUNDARY = "xx"
+BODY = (
+    b"--xx\r\n"
+    b'Content-Disposition: form-data; name="file"; filename="order.pdf"\r\n'
+    b"Content-Type: application/pdf\r\n\r\n"
+    b"%PDF-1.4 hello\r\n"
+    b"--xx--\r\n"
+)
+
+
+class FakeRequest:
+    def __init__(self, body, boundary=BOUNDARY, chunk=7):
+        self.body = body
+        self.chunk = chunk
+        self.headers = {"content-type": f"multipart/form-data; boundary={boundary}"}
+
+    async def stream(self):
+        for start in range(0, len(self.body), self.chunk):
+            yield self.body[start:start + self.chunk]
+
+
+def receive(request, **kwargs):
+    return asyncio.run(upload_buffer.receive_upload(request, **kwargs))
+
+
+def test_receives_file_part():
+    with receive(FakeRequest(BODY)) as upload:
+        assert upload.filename == "order.pdf"
+        assert upload.source() == b"%PDF-1.4 hello"
+
+
+@pytest.mark.parametrize("body, boundary", [
+    (b"garbage that is not multipart at all\r\n", BOUNDARY),
+    (BODY, "yy"),
+    (BODY[:-12], BOUNDARY),
+    (BODY[:40], BOUNDARY),
+])
+def test_malformed_or_truncated_body_is_invalid(body, boundary):
+    with pytest.raises(upload_buffer.InvalidUpload):
+        receive(FakeRequest(body, boundary))
+
+
+def test_refused_filename_is_unsupported():
+    request = FakeRequest(BODY)
+    with pytest.raises(upload_buffer.UnsupportedUpload):
+        receive(request, accept=lambda name: name.endswith(".txt"))
@@ -0,0 +1,76 @@
+import pytest
+
+faiss = pytest.importorskip("faiss")
+langchain_faiss = pytest.importorskip("langchain_community.vectorstores")
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+
+import vector_index
+
+DIM = 16
+
+
+def make_store(kind, count=300):
+    vectors = np.random.default_rng(0).normal(size=(count, DIM)).astype("float32") * 10
+    index = vector_index.build_index(vectors, kind, pq_m=4)
+    store = langchain_faiss.FAISS(None, index, InMemoryDocstore(), {})
+    texts = [f"passage {i}" for i in range(count)]
+    store.add_embeddings(zip(texts, vectors), ids=[f"id{i}" for i in range(count)])
+    return store, dict(zip(texts, vectors))
+
+
+def check_positions(store, vectors):
+    """Every passage's own vector must come back as the label that maps to that passage"""
+    for position, doc_id in store.index_to_docstore_id.items():
+        text = store.docstore.search(doc_id).page_content
+        _, labels = store.index.search(vectors[text][None, :], 1)
+        assert labels[0][0] in store.index_to_docstore_id, text
+        assert store.docstore.search(store.index_to_docstore_id[labels[0][0]]).page_content == text
+
+
+@pytest.mark.parametrize("kind", [kind for kind in vector_index.INDEX_TYPES if vector_index.supports_remove(kind)])
+def test_delete_keeps_positions_and_passages_in_step(kind):
+    store, vectors = make_store(kind)
+    store.delete([f"id{i}" for i in range(0, 300, 3)])
+    assert store.index.ntotal == 200
+    check_positions(store, vectors)
+
+
+@pytest.mark.parametrize("kind", ["ivf_flat", "ivf_pq", "hnsw"])
+def test_stale_ids_rebuild_indexes_that_cannot_remove(kind):
+    Ingest = pytest.importorskip("Ingest")
+    assert not vector_index.supports_remove(kind)
+    # A file indexed last run is gone, so its chunks are stale
+    manifest = {"files": {"gone.txt": {"sha256": "x", "chunks": ["gone:1", "gone:2"], "duplicates": []}}}
+    _, _, stale_ids = Ingest.plan_changes([], manifest)
+    assert stale_ids == {"gone:1", "gone:2"}
+    assert Ingest.needs_rebuild(manifest, stale_ids, kind=kind)
+    assert not Ingest.needs_rebuild(manifest, set(), kind=kind)
+    assert not Ingest.needs_rebuild(None, stale_ids, kind=kind)
+
+
+def test_stale_ids_are_deleted_in_place_when_supported():
+    Ingest = pytest.importorskip("Ingest")
+    manifest = {"files": {"gone.txt": {"sha256": "x", "chunks": ["gone:1"], "duplicates": []}}}
+    assert not Ingest.needs_rebuild(manifest, {"gone:1"}, kind="flat")
+    assert Ingest.needs_rebuild(manifest, {"gone:1"}, untrained=True, kind="flat")
+
+
+def test_resumed_copy_drops_stale_rows(tmp_path):
+    Ingest = pytest.importorskip("Ingest")
+    rows = np.arange(8, dtype="float32").reshape(4, 2)
+    part_path = str(tmp_path / "vectors.npy.part")
+    # Three rows were checkpointed; the fourth was written after the checkpoint
+    rows.tofile(part_path)
+    store = type("Store", (), {})()
+    store.index = faiss.IndexFlatL2(2)
+    store.index_to_docstore_id = {0: "a", 1: "b", 2: "c"}
+
+    copy = Ingest.VectorCopy.resume(part_path, 3, store, {"b"})
+    assert copy.rows == 2
+    assert copy.part_path != part_path
+    # The checkpointed part file is left as it was until a checkpoint names the new one
+    assert np.fromfile(part_path, dtype="float32").reshape(-1, 2).tolist() == rows[:3].tolist()
+
+    copy.save(str(tmp_path / "vectors.npy"), 2)
+    assert np.load(tmp_path / "vectors.npy").tolist() == [rows[0].tolist(), rows[2].tolist()]
@@ -0,0 +1,183 @@
+"""FAISS index construction for the embedding store.
+
+VECTOR_INDEX_TYPE picks the structure:
+
+* ``flat``: exact brute-force scan, no training
+* ``ivf_flat``: inverted lists over k-means cells, searches VECTOR_INDEX_NPROBE cells
+* ``hnsw``: graph index, no training, cannot delete vectors
+* ``ivf_pq``: inverted lists with product-quantized codes, smallest and lossiest
+* ``fp16``: exact scan over float16 vectors, half the memory of ``flat``
+* ``sq8``: exact scan over 8-bit scalar-quantized vectors, a quarter of ``flat``
+* ``pq``: exact scan over product-quantized codes, VECTOR_INDEX_PQ_M bytes a vector
+
+Trained types learn their cells and codebooks from up to
+VECTOR_INDEX_TRAIN_SAMPLE vectors. ``python bench_vector_index.py`` compares
+them on real embeddings. HNSW and IVF indexes are rebuilt when chunks are
+deleted; the flat types delete in place.
+
+Lossy types keep a float32 copy of every vector on disk (``vectors.npy``,
+written by Ingest.py). Searches memory-map it and re-rank
+VECTOR_INDEX_RERANK times as many candidates as asked for by exact distance,
+so only the candidate rows are read and the worker holds just the codes.
+"""
+import logging
+import os
+
+import faiss
+import numpy as np
+
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "flat")
+VECTOR_INDEX_NLIST = int(os.getenv("VECTOR_INDEX_NLIST", "1024"))
+VECTOR_INDEX_NPROBE = int(os.getenv("VECTOR_INDEX_NPROBE", "16"))
+VECTOR_INDEX_HNSW_M = int(os.getenv("VECTOR_INDEX_HNSW_M", "32"))
+VECTOR_INDEX_EF_SEARCH = int(os.getenv("VECTOR_INDEX_EF_SEARCH", "64"))
+VECTOR_INDEX_PQ_M = int(os.getenv("VECTOR_INDEX_PQ_M", "48"))
+VECTOR_INDEX_TRAIN_SAMPLE = int(os.getenv("VECTOR_INDEX_TRAIN_SAMPLE", "50000"))
+# Candidates per requested result re-ranked at full precision; 0 returns quantized distances
+VECTOR_INDEX_RERANK = int(os.getenv("VECTOR_INDEX_RERANK", "4"))
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq", "fp16", "sq8", "pq")
+QUANTIZED_TYPES = ("ivf_pq", "fp16", "sq8", "pq")
+VECTORS_FILE = "vectors.npy"
+
+# faiss warns below ~39 training points per k-means centroid
+MIN_POINTS_PER_CELL = 39
+PQ_CODEBOOK_SIZE = 256  # 8-bit codes
+
+
+def index_settings(kind=VECTOR_INDEX_TYPE):
+    """Parameters baked into the saved index; a change means rebuilding it"""
+    settings = {"type": kind}
+    if kind in ("ivf_flat", "ivf_pq"):
+        settings["nlist"] = VECTOR_INDEX_NLIST
+    if kind in ("ivf_pq", "pq"):
+        settings["pq_m"] = VECTOR_INDEX_PQ_M
+    if kind == "hnsw":
+        settings["hnsw_m"] = VECTOR_INDEX_HNSW_M
+    return settings
+
+
+def needs_training(kind=VECTOR_INDEX_TYPE):
+    return kind in ("ivf_flat", "ivf_pq", "sq8", "pq")
+
+
+def is_quantized(kind=VECTOR_INDEX_TYPE):
+    """Whether the index stores lossy codes, so full-precision vectors are kept for re-ranking"""
+    return kind in QUANTIZED_TYPES
+
+
+def supports_remove(kind=VECTOR_INDEX_TYPE):
+    """Whether LangChain's ``FAISS.delete`` keeps labels and positions in step.
+
+    It renumbers ``index_to_docstore_id`` to 0..n-1, which only matches index
+    types whose ``remove_ids`` compacts the remaining vectors. HNSW cannot
+    remove at all and IVF types keep the old labels.
+    """
+    return kind in ("flat", "fp16", "sq8", "pq")
+
+
+def factory_string(kind, dim, train_count, nlist=VECTOR_INDEX_NLIST,
+                   hnsw_m=VECTOR_INDEX_HNSW_M, pq_m=VECTOR_INDEX_PQ_M):
+    """faiss.index_factory description for ``kind``, shrunk to fit the training data"""
+    if kind == "flat":
+        return "Flat"
+    if kind == "hnsw":
+        return f"HNSW{hnsw_m}"
+    if kind == "fp16":
+        return "SQfp16"
+    if kind == "sq8":
+        return "SQ8"
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown VECTOR_INDEX_TYPE {kind!r}, expected one of {', '.join(INDEX_TYPES)}")
+
+    if kind in ("ivf_pq", "pq"):
+        if dim % pq_m:
+            raise ValueError(f"VECTOR_INDEX_PQ_M={pq_m} must divide the embedding size {dim}")
+        if train_count < PQ_CODEBOOK_SIZE:
+            return None
+        if kind == "pq":
+            return f"PQ{pq_m}"
+
+    cells = min(nlist, train_count // MIN_POINTS_PER_CELL)
+    if cells < 1:
+        return None
+    if kind == "ivf_flat":
+        return f"IVF{cells},Flat"
+    return f"IVF{cells},PQ{pq_m}"
+
+
+def tune(index, nprobe=VECTOR_INDEX_NPROBE, ef_search=VECTOR_INDEX_EF_SEARCH):
+    """Apply search-time parameters; safe to call on any index type"""
+    if hasattr(index, "nprobe"):
+        index.nprobe = nprobe
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+    return index
+
+
+def build_index(sample, kind=VECTOR_INDEX_TYPE, **params):
+    """Create an empty index for vectors like ``sample``, trained on it if needed.
+
+    Falls back to a flat index when there is too little data to train ``kind``.
+    """
+    sample = np.ascontiguousarray(sample, dtype="float32")
+    dim = sample.shape[1]
+    description = factory_string(kind, dim, len(sample), **params)
+    if description is None:
+        logging.warning(
+            "Only %d vectors, too few to train a %s index; using a flat index.", len(sample), kind
+        )
+        description = "Flat"
+
+    index = faiss.index_factory(dim, description)
+    if not index.is_trained:
+        if len(sample) > VECTOR_INDEX_TRAIN_SAMPLE:
+            rows = np.random.default_rng(0).choice(len(sample), VECTOR_INDEX_TRAIN_SAMPLE, replace=False)
+            sample = sample[rows]
+        logging.info("Training %s index on %d vectors...", description, len(sample))
+        index.train(sample)
+    return tune(index)
+
+
+class RerankedIndex:
+    """A lossy index whose candidates are re-ranked against full-precision vectors.
+
+    ``vectors`` is usually a read-only memmap of VECTORS_FILE in FAISS position
+    order, so a query only pages in the rows of its candidates. Exposes the
+    ``search``/``ntotal`` subset of the faiss API that callers use.
+    """
+
+    def __init__(self, index, vectors, factor=VECTOR_INDEX_RERANK):
+        self.index = index
+        self.vectors = vectors
+        self.factor = factor
+
+    @property
+    def ntotal(self):
+        return self.index.ntotal
+
+    def search(self, queries, k):
+        distances, positions = self.index.search(queries, min(k * self.factor, self.ntotal))
+        out_distances = np.full((len(queries), k), np.inf, dtype="float32")
+        out_positions = np.full((len(queries), k), -1, dtype="int64")
+        for row, (query, candidates) in enumerate(zip(queries, positions)):
+            candidates = np.sort(candidates[candidates >= 0])
+            exact = ((np.asarray(self.vectors[candidates], dtype="float32") - query) ** 2).sum(axis=1)
+            order = np.argsort(exact)[:k]
+            out_distances[row, :len(order)] = exact[order]
+            out_positions[row, :len(order)] = candidates[order]
+        return out_distances, out_positions
+
+
+def with_rerank(index, index_dir, factor=VECTOR_INDEX_RERANK):
+    """Wrap ``index`` in a RerankedIndex when index_dir has matching full-precision vectors"""
+    path = os.path.join(index_dir, VECTORS_FILE)
+    if factor < 1 or not os.path.exists(path):
+        return index
+    vectors = np.load(path, mmap_mode="r")
+    if vectors.shape[0] != index.ntotal:
+        logging.warning(
+            "%s has %d vectors, the index %d; searching without re-ranking.", path, vectors.shape[0], index.ntotal
+        )
+        return index
+    return RerankedIndex(index, vectors, factor)
@@ -0,0 +1,160 @@
+"""Content-addressed cache of extracted document text.
+
+Keyed by the SHA-256 of the uploaded bytes, so the same FIR or agreement
+uploaded through /api/upload-document or /api/upload-evidence is parsed once.
+The disk tier is a directory both services point at; it is bounded by total
+size and evicts the least recently used files first.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+EXTRACTION_CACHE_SIZE = int(os.getenv("EXTRACTION_CACHE_SIZE", "64"))
+EXTRACTION_CACHE_DIR = os.getenv(
+    "EXTRACTION_CACHE_DIR", os.path.join(tempfile.gettempdir(), "nyaya_sahaya_extraction")
+)
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+def document_key(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class ExtractionCache:
+    """Memory LRU of recent documents in front of a size-bounded disk directory.
+
+    Entries are ``{"pages": [...], "page_count": n}``. Set ``disk_dir`` to an
+    empty string to keep the cache in memory only.
+    """
+
+    def __init__(self, max_entries=64, disk_dir=None, max_disk_bytes=512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir or None
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()  # get/set run in worker threads
+        self._disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _disk_files(self):
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(".json"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((entry.path, stat.st_size, stat.st_mtime))
+        return files
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        if self.disk_dir:
+            path = self._path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                # mtime doubles as last-used time for eviction
+                os.utime(path)
+                self._remember(key, entry)
+                self.disk_hits += 1
+                return entry
+            except (OSError, ValueError):
+                pass
+
+        self.misses += 1
+        return None
+
+    def set(self, key, pages, page_count):
+        entry = {"pages": pages, "page_count": page_count}
+        self._remember(key, entry)
+        if not self.disk_dir:
+            return
+
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            size = os.path.getsize(tmp_path)
+            try:
+                # Re-caching a document overwrites its file, which is already counted
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[EXTRACTION CACHE] ⚠️ Could not write {path}: {e}")
+            return
+
+        with self._lock:
+            self._disk_bytes += size - replaced
+        if self._disk_bytes > self.max_disk_bytes:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        # Rescan: the other service may have added or removed files
+        files = sorted(self._disk_files(), key=lambda item: item[2])
+        total = sum(size for _, size, _ in files)
+        for path, size, _ in files:
+            if total <= self.max_disk_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._disk_bytes = total
+
+    def stats(self):
+        return {
+            "entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "disk_dir": self.disk_dir,
+            "disk_bytes": self._disk_bytes,
+            "max_disk_bytes": self.max_disk_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
+
+
+# Built on first use: spawned PDF workers import this module but never touch
+# the cache, so they should not create its directory or scan it
+_extraction_cache = None
+_extraction_cache_lock = threading.Lock()
+
+
+def get_extraction_cache():
+    """Return the process-wide cache, creating it on first use"""
+    global _extraction_cache
+    with _extraction_cache_lock:
+        if _extraction_cache is None:
+            _extraction_cache = ExtractionCache(
+                EXTRACTION_CACHE_SIZE, EXTRACTION_CACHE_DIR, EXTRACTION_CACHE_MAX_BYTES
+            )
+        return _extraction_cache
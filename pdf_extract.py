@@ -0,0 +1,193 @@
+"""PDF text extraction on a worker process pool.
+
+Shared by pdf_to_text_api.py and NyayaSahaya-bot/app.py. Large PDFs are split
+into page ranges that are extracted in parallel and reassembled in order, so
+parsing uses every core and never runs on the event loop thread.
+
+Every function takes the PDF either as bytes or as the path of a spooled
+upload; workers open paths themselves so large files are not pickled to them.
+"""
+import asyncio
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PyPDF2 import PdfReader
+
+from extraction_cache import document_key, get_extraction_cache
+
+PDF_POOL_SIZE = int(os.getenv("PDF_POOL_SIZE", str(os.cpu_count() or 2)))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "25"))
+# Pages in the first job, kept small so streaming can start right away
+PDF_FIRST_TASK_PAGES = int(os.getenv("PDF_FIRST_TASK_PAGES", "2"))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "2000"))
+PDF_TIME_BUDGET = float(os.getenv("PDF_TIME_BUDGET", "120"))
+
+_pool = None
+
+
+class PdfBudgetExceeded(Exception):
+    """Extraction of one document ran past PDF_TIME_BUDGET seconds"""
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        # spawn keeps workers clean of the server's threads and sockets; each
+        # worker still re-imports __main__, so the app does its start-up work
+        # in lifespan rather than at import time
+        _pool = ProcessPoolExecutor(
+            max_workers=PDF_POOL_SIZE,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+
+def open_reader(source):
+    return PdfReader(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+
+
+def count_pages(data):
+    return len(open_reader(data).pages)
+
+
+def extract_range(data, start, end, deadline=None):
+    """Worker: extract pages [start, end) and return their text in order.
+
+    ``deadline`` is a ``time.time()`` value checked before each page, so a
+    job outliving its document's budget frees the worker instead of parsing
+    pages nobody will read.
+    """
+    reader = open_reader(data)
+    texts = []
+    for i in range(start, end):
+        if deadline is not None and time.time() > deadline:
+            raise PdfBudgetExceeded(f"PDF extraction stopped at page {i + 1}, past its time budget")
+        texts.append(reader.pages[i].extract_text() or "")
+    return texts
+
+
+def page_ranges(page_count, pool_size=PDF_POOL_SIZE, pages_per_task=PDF_PAGES_PER_TASK,
+                first_pages=PDF_FIRST_TASK_PAGES):
+    """Split pages into contiguous ranges, at least one per worker for big documents.
+
+    The first range holds only ``first_pages`` pages: results are yielded in
+    page order, so the first page can be no sooner than the first range.
+    """
+    if page_count < 1:
+        return []
+    first = max(1, min(first_pages, page_count))
+    rest = page_count - first
+    size = max(1, min(pages_per_task, -(-rest // pool_size)))
+    return [(0, first)] + [(start, min(start + size, page_count)) for start in range(first, page_count, size)]
+
+
+async def submit_ranges(data, max_pages, time_budget):
+    """Count pages and queue one extraction job per range; returns (page_count, futures)"""
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    # Wall clock, since the workers are other processes
+    deadline = time.time() + time_budget
+    page_count = await loop.run_in_executor(pool, count_pages, data)
+    futures = [
+        loop.run_in_executor(pool, extract_range, data, start, end, deadline)
+        for start, end in page_ranges(min(page_count, max_pages))
+    ]
+    return page_count, futures
+
+
+async def iter_pdf_pages(data, max_pages=None, time_budget=None):
+    """Yield ``(page_number, text)`` in page order while ranges finish in parallel.
+
+    Pages past ``max_pages`` are skipped. Raises :class:`PdfBudgetExceeded`
+    if the whole document takes longer than ``time_budget`` seconds.
+    """
+    max_pages = PDF_MAX_PAGES if max_pages is None else max_pages
+    time_budget = PDF_TIME_BUDGET if time_budget is None else time_budget
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + time_budget
+    page_count, futures = await submit_ranges(data, max_pages, time_budget)
+    try:
+        page_number = 0
+        for future in futures:
+            try:
+                texts = await asyncio.wait_for(asyncio.shield(future), max(deadline - loop.time(), 0))
+            except (asyncio.TimeoutError, PdfBudgetExceeded):
+                raise PdfBudgetExceeded(
+                    f"PDF extraction exceeded {time_budget:.0f}s after {page_number} of {page_count} pages"
+                )
+            for text in texts:
+                page_number += 1
+                yield page_number, text
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+async def extract_pdf_pages(data, max_pages=None, time_budget=None):
+    """Extract a whole PDF; returns ``(page_texts, total_page_count)``.
+
+    ``page_texts`` is shorter than the page count when the document has more
+    than ``max_pages`` pages.
+    """
+    max_pages = PDF_MAX_PAGES if max_pages is None else max_pages
+    time_budget = PDF_TIME_BUDGET if time_budget is None else time_budget
+
+    page_count, futures = await submit_ranges(data, max_pages, time_budget)
+    try:
+        ranges = await asyncio.wait_for(asyncio.gather(*futures), time_budget)
+    except (asyncio.TimeoutError, PdfBudgetExceeded):
+        for future in futures:
+            future.cancel()
+        raise PdfBudgetExceeded(f"PDF extraction of {page_count} pages exceeded {time_budget:.0f}s")
+    return [text for texts in ranges for text in texts], page_count
+
+
+async def extract_pdf_pages_cached(data, max_pages=None, time_budget=None, key=None):
+    """:func:`extract_pdf_pages` behind the shared extraction cache.
+
+    Pass ``key`` when the content hash is already known, e.g. from a spooled
+    upload; it is required when ``data`` is a path.
+    """
+    key = key or await asyncio.to_thread(document_key, data)
+    entry = await asyncio.to_thread(get_extraction_cache().get, key)
+    if entry is not None:
+        print(f"[PDF] ⚡ Extraction cache hit for {key[:12]}")
+        return entry["pages"], entry["page_count"]
+
+    pages, page_count = await extract_pdf_pages(data, max_pages, time_budget)
+    await asyncio.to_thread(get_extraction_cache().set, key, pages, page_count)
+    return pages, page_count
+
+
+async def iter_pdf_pages_cached(data, max_pages=None, time_budget=None, key=None):
+    """:func:`iter_pdf_pages` behind the shared extraction cache.
+
+    A fully streamed document is stored once its last page is yielded;
+    documents cut off at ``max_pages`` are not, since their page count is unknown.
+    """
+    key = key or await asyncio.to_thread(document_key, data)
+    entry = await asyncio.to_thread(get_extraction_cache().get, key)
+    if entry is not None:
+        print(f"[PDF] ⚡ Extraction cache hit for {key[:12]}")
+        for number, text in enumerate(entry["pages"], start=1):
+            yield number, text
+        return
+
+    max_pages = PDF_MAX_PAGES if max_pages is None else max_pages
+    pages = []
+    async for number, text in iter_pdf_pages(data, max_pages, time_budget):
+        pages.append(text)
+        yield number, text
+    if len(pages) < max_pages:
+        await asyncio.to_thread(get_extraction_cache().set, key, pages, len(pages))
@@ -1,11 +1,46 @@
-from fastapi import FastAPI, File, UploadFile
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from PyPDF2 import PdfReader
-import os
-import shutil
-import tempfile
+from fastapi.responses import JSONResponse, StreamingResponse
+from contextlib import asynccontextmanager
+import json
+import sys
+from pdf_extract import extract_pdf_pages_cached, iter_pdf_pages_cached, shutdown_pool
+from upload_buffer import (
+    UPLOAD_MAX_BYTES, InvalidUpload, UnsupportedUpload, UploadTooLarge, content_length_exceeds, receive_upload,
+)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    shutdown_pool()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def is_pdf(filename):
+    # Only allow PDF for this example; checked before any of the file is received
+    return filename.lower().endswith('.pdf')
+
+
+@app.exception_handler(UploadTooLarge)
+async def upload_too_large_handler(request, exc):
+    return JSONResponse({"error": str(exc), "max_bytes": exc.limit}, status_code=413)
+
+
+@app.exception_handler(InvalidUpload)
+async def invalid_upload_handler(request, exc):
+    return JSONResponse({"error": str(exc)}, status_code=400)
+
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    # Refuse before the multipart body is received when the size is declared
+    if request.url.path.startswith("/api/upload-document") and content_length_exceeds(request.headers):
+        return await upload_too_large_handler(request, UploadTooLarge(UPLOAD_MAX_BYTES))
+    return await call_next(request)
 
-app = FastAPI()
 
 # Allow CORS for local frontend
 app.add_middleware(
@@ -16,30 +51,81 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.post("/api/upload-document")
-async def upload_document(file: UploadFile = File(...)):
-    # Only allow PDF for this example
-    if not file.filename.lower().endswith('.pdf'):
-        return {"error": "Only PDF files are supported."}
-
-    # Save file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        shutil.copyfileobj(file.file, tmp)
-        tmp_path = tmp.name
 
-    # Extract text
+@app.post("/api/upload-document")
+async def upload_document(request: Request):
+    # Pages are extracted in parallel on the PDF worker pool, unless this
+    # exact file was seen before by either service
+    # Large files are spooled to disk and opened there by the workers
     try:
-        reader = PdfReader(tmp_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() or ""
-        os.remove(tmp_path)
+        with await receive_upload(request, accept=is_pdf) as upload:
+            pages, page_count = await extract_pdf_pages_cached(upload.source(), key=upload.key)
+            text = "".join(pages)
+            upload.note_memory(sys.getsizeof(text))
+            upload_stats = upload.stats()
         if not text.strip():
             return {"error": "No text found in PDF."}
         # You can store or process the text here as needed
-        return {"text": text, "message": "Document processed successfully!"}
+        result = {"text": text, "message": "Document processed successfully!", "upload": upload_stats}
+        if len(pages) < page_count:
+            result["truncated"] = True
+            result["message"] = f"Only the first {len(pages)} of {page_count} pages were processed."
+        return result
+    except UnsupportedUpload:
+        return {"error": "Only PDF files are supported."}
+    except (UploadTooLarge, InvalidUpload):
+        raise
     except Exception as e:
-        os.remove(tmp_path)
         return {"error": f"Failed to process PDF: {str(e)}"}
 
-# To run: uvicorn pdf_to_text_api:app --reload
\ No newline at end of file
+
+class UploadStreamingResponse(StreamingResponse):
+    """StreamingResponse that closes ``upload`` once it is done, however it ends.
+
+    The generator's own ``finally`` never runs if the client disconnects
+    before the first chunk, and Starlette skips background tasks when the
+    send fails, so the close happens here.
+    """
+
+    def __init__(self, content, upload, **kwargs):
+        super().__init__(content, **kwargs)
+        self.upload = upload
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.upload.close()
+
+
+@app.post("/api/upload-document/stream")
+async def upload_document_stream(request: Request):
+    """Stream extracted text page by page as NDJSON.
+
+    Emits one ``{"page": n, "text": ...}`` line per page, then a final
+    ``{"done": true, "pages": n, "chars": total}`` line. Errors are sent as
+    ``{"error": ...}`` lines since the status code is already committed.
+    """
+    try:
+        upload = await receive_upload(request, accept=is_pdf)
+    except UnsupportedUpload:
+        return {"error": "Only PDF files are supported."}
+
+    async def lines():
+        pages = chars = 0
+        try:
+            async for number, page_text in iter_pdf_pages_cached(upload.source(), key=upload.key):
+                pages = number
+                chars += len(page_text)
+                yield json.dumps({"page": number, "text": page_text}) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": f"Failed to process PDF: {str(e)}", "page": pages + 1}) + "\n"
+            return
+        finally:
+            upload_stats = upload.stats()
+            upload.close()
+        yield json.dumps({"done": True, "pages": pages, "chars": chars, "upload": upload_stats}) + "\n"
+
+    return UploadStreamingResponse(lines(), upload, media_type="application/x-ndjson")
+
+# To run: uvicorn pdf_to_text_api:app --reload
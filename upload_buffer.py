@@ -0,0 +1,259 @@
+"""Memory-bounded handling of uploaded files.
+
+Shared by pdf_to_text_api.py and NyayaSahaya-bot/app.py. The multipart body
+is parsed straight off the request stream, and the file part goes into a
+buffer that stays in memory up to UPLOAD_SPOOL_BYTES and spills to a named
+temporary file after that. Each byte is written once, hashed as it goes so
+the extraction cache key is ready without another pass, and the PDF workers
+open the temporary file by name. Anything over UPLOAD_MAX_BYTES is rejected
+with 413: from the Content-Length header when the client sends one, and
+otherwise as soon as that much has arrived.
+"""
+import asyncio
+import codecs
+import hashlib
+import os
+import sys
+import tempfile
+
+try:
+    from python_multipart.multipart import MultipartParseError, MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParseError, MultipartParser, parse_options_header
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(4 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(256 * 1024)))
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR") or None
+
+# Room for multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Upload is bigger than UPLOAD_MAX_BYTES"""
+
+    def __init__(self, limit):
+        super().__init__(f"File exceeds the {limit / (1024 * 1024):.3g} MB upload limit")
+        self.limit = limit
+
+
+class InvalidUpload(ValueError):
+    """Request is not a multipart upload with the expected file field"""
+
+
+class UnsupportedUpload(InvalidUpload):
+    """Uploaded file's name was refused by the endpoint's ``accept`` check"""
+
+    def __init__(self, filename):
+        super().__init__(f"Unsupported file type: {filename}")
+        self.filename = filename
+
+
+def content_length_exceeds(headers, max_bytes=None):
+    """True when a request's declared body is too big to hold an allowed upload"""
+    max_bytes = UPLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    try:
+        return int(headers.get("content-length", "")) > max_bytes + MULTIPART_OVERHEAD
+    except ValueError:
+        return False
+
+
+def peak_rss_mb():
+    """High-water mark of this process's resident memory, or None if unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class SpooledUpload:
+    """Upload body held in memory while small and in a temporary file once large.
+
+    :meth:`source` returns what the PDF workers open: the bytes themselves, or
+    the temporary file's path so large documents are never copied into memory.
+    Call :meth:`close` (or use ``with``) to remove the temporary file.
+    """
+
+    def __init__(self, spool_bytes=UPLOAD_SPOOL_BYTES, tmp_dir=UPLOAD_TMP_DIR):
+        self.spool_bytes = spool_bytes
+        self.tmp_dir = tmp_dir
+        self.memory = bytearray()
+        self.path = None
+        self._file = None
+        self._hash = hashlib.sha256()
+        self.filename = None
+        self.size = 0
+        self.peak_memory_bytes = 0
+
+    def write(self, chunk):
+        self._hash.update(chunk)
+        self.size += len(chunk)
+        if self._file is None and len(self.memory) + len(chunk) > self.spool_bytes:
+            self._file = tempfile.NamedTemporaryFile(
+                prefix="upload_", dir=self.tmp_dir, delete=False
+            )
+            self.path = self._file.name
+            self._file.write(self.memory)
+            self.memory = bytearray()
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self.memory += chunk
+            self.peak_memory_bytes = max(self.peak_memory_bytes, len(self.memory))
+
+    def finish(self):
+        if self._file is not None:
+            self._file.close()
+
+    @property
+    def key(self):
+        """SHA-256 of the whole upload, as used by the extraction cache"""
+        return self._hash.hexdigest()
+
+    def source(self):
+        return self.path if self.path else bytes(self.memory)
+
+    def iter_chunks(self, size=UPLOAD_CHUNK_BYTES):
+        if self.path is None:
+            for start in range(0, len(self.memory), size):
+                yield bytes(self.memory[start:start + size])
+            return
+        with open(self.path, "rb") as f:
+            while chunk := f.read(size):
+                yield chunk
+
+    def decode_text(self, encoding="utf-8"):
+        """Decode the upload chunk by chunk instead of from one large bytes copy"""
+        decoder = codecs.getincrementaldecoder(encoding)(errors="ignore")
+        parts = [decoder.decode(chunk) for chunk in self.iter_chunks()]
+        parts.append(decoder.decode(b"", final=True))
+        text = "".join(parts)
+        self.note_memory(sys.getsizeof(text))
+        return text
+
+    def note_memory(self, nbytes):
+        """Count memory held for this request on top of the spool buffer"""
+        self.peak_memory_bytes = max(self.peak_memory_bytes, len(self.memory) + nbytes)
+
+    def stats(self):
+        return {
+            "size_bytes": self.size,
+            "spilled_to_disk": self.path is not None,
+            "peak_memory_bytes": self.peak_memory_bytes,
+            "process_peak_rss_mb": peak_rss_mb(),
+        }
+
+    def close(self):
+        self.finish()
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+        self.memory = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+async def _append(upload, chunk, max_bytes):
+    if upload.size + len(chunk) > max_bytes:
+        raise UploadTooLarge(max_bytes)
+    if upload.path is None and len(upload.memory) + len(chunk) <= upload.spool_bytes:
+        upload.write(chunk)
+    else:
+        # Spilled to disk: keep file writes off the event loop
+        await asyncio.to_thread(upload.write, chunk)
+
+
+async def receive_upload(request, field="file", max_bytes=None, spool_bytes=None, accept=None):
+    """Parse the ``field`` file of a multipart request into a :class:`SpooledUpload`.
+
+    Reads ``request.stream()`` directly instead of letting the framework
+    spool the whole body first. Raises :class:`UploadTooLarge` as soon as
+    more than ``max_bytes`` have arrived, :class:`UnsupportedUpload` as soon
+    as the file part's headers name a file ``accept(filename)`` refuses, and
+    :class:`InvalidUpload` when the request has no such file or its
+    multipart body is malformed or cut short; the partial buffer is
+    discarded in every case.
+    """
+    max_bytes = UPLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise InvalidUpload("Expected a multipart/form-data upload")
+
+    upload = SpooledUpload(UPLOAD_SPOOL_BYTES if spool_bytes is None else spool_bytes)
+    part = {"header": b"", "value": b"", "headers": {}, "wanted": False, "ended": False}
+    received = []
+
+    def on_header_field(data, start, end):
+        part["header"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["header"].lower()] = part["value"]
+        part["header"] = part["value"] = b""
+
+    def on_headers_finished():
+        _, options = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        part["headers"] = {}
+        # Only the first file sent under ``field`` is kept
+        part["wanted"] = (
+            options.get(b"name") == field.encode() and b"filename" in options and upload.filename is None
+        )
+        if part["wanted"]:
+            upload.filename = options[b"filename"].decode("utf-8", "replace")
+            if accept is not None and not accept(upload.filename):
+                raise UnsupportedUpload(upload.filename)
+
+    def on_part_data(data, start, end):
+        if part["wanted"]:
+            received.append(bytes(data[start:end]))
+
+    def on_end():
+        part["ended"] = True
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_end": on_end,
+    })
+    body_bytes = 0
+    try:
+        async for chunk in request.stream():
+            body_bytes += len(chunk)
+            if body_bytes > max_bytes + MULTIPART_OVERHEAD:
+                raise UploadTooLarge(max_bytes)
+            parser.write(chunk)
+            for data in received:
+                await _append(upload, data, max_bytes)
+            received.clear()
+        parser.finalize()
+        if upload.filename is None:
+            raise InvalidUpload(f"Upload has no {field!r} file part")
+        if not part["ended"]:
+            raise InvalidUpload("Upload ended before the multipart body was complete")
+        upload.finish()
+    except MultipartParseError as e:
+        upload.close()
+        raise InvalidUpload(f"Malformed multipart body: {e}") from e
+    except BaseException:
+        upload.close()
+        raise
+    return upload